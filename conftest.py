@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def yatube_test_settings():
+    from django.test.utils import override_settings
+
+    from core.testing import TEST_SETTINGS
+
+    with override_settings(**TEST_SETTINGS):
+        yield
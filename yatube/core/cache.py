@@ -0,0 +1,49 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY = 'generation:{}'
+
+
+def _initial():
+    # После вытеснения ключа поколение не должно совпасть со старым:
+    # в микросекундах прежняя серия не догонит часы, даже если поколение
+    # сдвигали чаще раза в миллисекунду.
+    return int(time.time() * 1_000_000)
+
+
+def get_version(*namespaces):
+    """Вернуть строку из текущих поколений перечисленных пространств."""
+    keys = [GENERATION_KEY.format(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial(), None)
+            found[key] = cache.get(key)
+    return '.'.join(str(found[key]) for key in keys)
+
+
+def bump(*namespaces):
+    """Сдвинуть поколения: все ключи, собранные на старых, устаревают.
+
+    Возвращает новые поколения в том же виде, что и ``get_version``.
+    """
+    versions = []
+    for namespace in namespaces:
+        key = GENERATION_KEY.format(namespace)
+        try:
+            versions.append(cache.incr(key))
+        except ValueError:
+            cache.add(key, _initial(), None)
+            versions.append(cache.get(key))
+    return '.'.join(str(version) for version in versions)
+
+
+def bump_on_commit(*namespaces):
+    """Сдвинуть поколения после коммита текущей транзакции, вне её — сразу.
+
+    Запрос, пришедший между сдвигом и коммитом, прочитал бы старые строки
+    и сохранил их в кэше под новым поколением.
+    """
+    transaction.on_commit(lambda: bump(*namespaces))
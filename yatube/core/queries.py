@@ -0,0 +1,97 @@
+import logging
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r'IN \(%s(?:, %s)*\)')
+# Точки сохранения от atomic() — не обращения к данным.
+TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO')
+
+_state = threading.local()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """Обёртка ``execute_wrapper``: считает запросы и их формы."""
+
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if (not sql.startswith(TRANSACTION_CONTROL)
+                and not getattr(_state, 'uncounted', False)):
+            self.count += 1
+            self.shapes[shape(sql)] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, limit):
+        return [(sql, times) for sql, times in self.shapes.most_common()
+                if times > limit]
+
+
+@contextmanager
+def uncounted():
+    """Не считать запросы блока в бюджет: для разовой починки данных,
+    которая не повторяется от запроса к запросу."""
+    previous = getattr(_state, 'uncounted', False)
+    _state.uncounted = True
+    try:
+        yield
+    finally:
+        _state.uncounted = previous
+
+
+def shape(sql):
+    # Параметры уже вынесены в %s, остаётся схлопнуть списки IN (...).
+    return IN_LIST.sub('IN (%s...)', sql)
+
+
+def check_budget(name, counter, max_queries, max_repeats):
+    problems = []
+    if counter.count > max_queries:
+        problems.append(
+            f'{name}: {counter.count} запросов при бюджете {max_queries}')
+    for sql, times in counter.repeated(max_repeats):
+        problems.append(f'{name}: похоже на N+1, {times} раз: {sql}')
+    if not problems:
+        return
+    if settings.QUERY_BUDGET_RAISE:
+        raise QueryBudgetExceeded('\n'.join(problems))
+    for problem in problems:
+        logger.warning(problem)
+
+
+def query_budget(max_queries, max_repeats=None):
+    """Ограничить число SQL-запросов, которые делает view.
+
+    Считаются все запросы вместе с проверкой ETag, загрузкой сессии и
+    чтением хранилища миниатюр sorl.
+    Помимо общего бюджета ловятся одинаковые запросы, повторённые больше
+    ``max_repeats`` раз. При ``QUERY_BUDGET_RAISE`` превышение —
+    исключение, иначе — запись в лог. Годится и для urls.py:
+    ``query_budget(5)(views.index)``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            repeats = max_repeats
+            if repeats is None:
+                repeats = settings.QUERY_BUDGET_MAX_REPEATS
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                response = view(request, *args, **kwargs)
+            check_budget(view.__name__, counter, max_queries, repeats)
+            return response
+        return wrapper
+    return decorator
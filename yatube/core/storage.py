@@ -0,0 +1,51 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла — sha256 его содержимого.
+
+    Одинаковые файлы получают одно имя и лежат на диске один раз:
+    повторное сохранение возвращает имя уже лежащего файла. Удалять
+    такой файл можно, только когда на него больше никто не ссылается.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Пока наша ссылка не закоммичена, соседний запрос может снять
+            # последнюю старую и удалить файл: после коммита вернём его.
+            transaction.on_commit(lambda: self.restore(name, content))
+            return name
+        return self._save(name, content)
+
+    def restore(self, name, content):
+        """Положить ``content`` под именем ``name``, если файла нет."""
+        if self.exists(name):
+            return False
+        content.seek(0)
+        saved = self._save(name, content)
+        if saved != name:
+            # Файл успел вернуть кто-то ещё, копия не нужна.
+            self.delete(saved)
+        return True
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        key = digest.hexdigest()
+        return os.path.join(directory, key[:2], key + extension)
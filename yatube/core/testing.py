@@ -0,0 +1,22 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Настройки, с которыми идут тесты: и manage.py test, и pytest.
+TEST_SETTINGS = {
+    # Превышение бюджета запросов в тестах — ошибка, а не запись в лог.
+    'QUERY_BUDGET_RAISE': True,
+    # Фоновый поток писал бы просмотры в тестовую базу из своего
+    # соединения, а atexit — в настоящую, когда тестовой уже нет.
+    'VIEW_COUNTS_FLUSH_THREAD': False,
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(**TEST_SETTINGS)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.db.models.expressions import RawSQL
 
 from .models import Group, Post
+from .search import match_expression, matching_ids_sql
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -11,6 +13,13 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по тексту — полнотекстовый индекс.
+        if not match_expression(search_term):
+            return queryset, False
+        return queryset.filter(
+            pk__in=RawSQL(*matching_ids_sql(search_term))), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title',
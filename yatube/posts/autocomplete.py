@@ -0,0 +1,135 @@
+import threading
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from core.cache import bump, get_version
+
+from .models import Group, User
+
+
+# Какой объект поменялся на каждом поколении индекса: по этому журналу
+# процессы дочитывают из базы только изменённые строки.
+CHANGE_KEY = 'autocomplete:change:{}:{}'
+CHANGE_TIMEOUT = 60 * 60
+# Отстав больше чем на столько правок, процесс перечитывает всё.
+MAX_CHANGES = 100
+
+
+class PrefixIndex:
+    """Отсортированный список ключей в памяти процесса с поиском по префиксу.
+
+    Строится при первом обращении. После коммита правки сигналы сдвигают
+    поколение в кэше и записывают pk изменённого объекта. Процесс, который
+    видит новое поколение, дочитывает из базы только эти объекты. Если
+    журнал неполон (вытеснен или правок больше ``MAX_CHANGES``), таблица
+    перечитывается целиком: для 100 тысяч пользователей это около двух
+    секунд на процесс.
+    """
+
+    def __init__(self, namespace, load):
+        self.namespace = namespace
+        self.load = load
+        self.entries = None
+        self.version = None
+        self.lock = threading.Lock()
+
+    def search(self, prefix, limit):
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        entries = self.refresh()
+        found = {}
+        for index in range(bisect_left(entries, (prefix,)), len(entries)):
+            key, pk, payload = entries[index]
+            if not key.startswith(prefix) or len(found) >= limit:
+                break
+            found.setdefault(pk, payload)
+        return list(found.values())
+
+    def refresh(self):
+        version = get_version(self.namespace)
+        if self.entries is None or version != self.version:
+            with self.lock:
+                changed = self.changed_since(version)
+                if changed is None:
+                    self.entries = sorted(
+                        (key, pk, payload)
+                        for pk, keys, payload in self.load()
+                        for key in keys)
+                else:
+                    entries = [
+                        entry for entry in self.entries
+                        if entry[1] not in changed]
+                    for pk, keys, payload in self.load(changed):
+                        for key in keys:
+                            insort(entries, (key, pk, payload))
+                    self.entries = entries
+                self.version = version
+        return self.entries
+
+    def changed_since(self, version):
+        """pk объектов, изменённых после ``self.version``; None — если
+        журнал неполон и список надо строить заново."""
+        if self.entries is None:
+            return None
+        old, new = int(self.version), int(version)
+        if not 0 < new - old <= MAX_CHANGES:
+            return None
+        keys = [CHANGE_KEY.format(self.namespace, number)
+                for number in range(old + 1, new + 1)]
+        found = cache.get_many(keys)
+        if len(found) < len(keys):
+            return None
+        return set(found.values())
+
+    def changed(self, pk):
+        """Объект ``pk`` создан, изменён или удалён. Вызывать после
+        коммита: иначе другой процесс прочитает базу без правки и
+        запомнит новое поколение как уже учтённое."""
+        version = bump(self.namespace)
+        cache.set(
+            CHANGE_KEY.format(self.namespace, version), pk, CHANGE_TIMEOUT)
+
+
+def user_entries(pks=None):
+    users = User.objects.all()
+    if pks is not None:
+        users = users.filter(pk__in=pks)
+    for pk, username in users.values_list('pk', 'username'):
+        yield pk, user_keys(username), user_payload(username)
+
+
+def user_keys(username):
+    return [username.lower()]
+
+
+def user_payload(username):
+    return {
+        'username': username,
+        'url': reverse('posts:profile', args=[username]),
+    }
+
+
+def group_entries(pks=None):
+    groups = Group.objects.all()
+    if pks is not None:
+        groups = groups.filter(pk__in=pks)
+    for pk, title, slug in groups.values_list('pk', 'title', 'slug'):
+        yield pk, group_keys(title), group_payload(pk, title, slug)
+
+
+def group_keys(title):
+    # Ищем и по началу названия, и по началу любого слова в нём.
+    title = title.lower()
+    return sorted({title, *title.split()})
+
+
+def group_payload(pk, title, slug):
+    return {'id': pk, 'title': title, 'slug': slug}
+
+
+users = PrefixIndex('autocomplete:users', user_entries)
+groups = PrefixIndex('autocomplete:groups', group_entries)
+INDEXES = {'users': users, 'groups': groups}
@@ -0,0 +1,73 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from core.cache import get_version
+from .feeds import (cached_group, follow_version, group_version,
+                    index_version, profile_version, trending_version)
+from .models import Comment, Post, User
+
+
+def make_etag(request, *parts):
+    """ETag из версии данных, зрителя и параметров страницы.
+
+    В страницу попадают имя пользователя и CSRF-токен формы, поэтому
+    ответ одного посетителя не должен подойти другому.
+    """
+    parts += (
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        request.GET.urlencode(),
+    )
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def index_etag(request):
+    return make_etag(request, 'index', index_version())
+
+
+def trending_etag(request):
+    return make_etag(request, 'trending', trending_version())
+
+
+def group_etag(request, slug):
+    group = cached_group(slug)
+    if group is None:
+        return None
+    return make_etag(request, 'group', group.pk, group_version(group))
+
+
+def profile_etag(request, username):
+    author = User.objects.filter(username=username).only('pk').first()
+    if author is None:
+        return None
+    return make_etag(request, 'profile', author.pk, profile_version(author),
+                     get_version('suggestions'))
+
+
+def follow_etag(request):
+    return make_etag(request, 'follow', follow_version(request.user),
+                     get_version('suggestions'))
+
+
+def post_detail_etag(request, post_id):
+    # Last-Modified у страницы нет: по одной дате не учесть зрителя,
+    # просмотры и переименование автора, а без If-None-Match Django
+    # сверял бы только её.
+    last_comment = Comment.objects.filter(
+        post=OuterRef('pk')).order_by('-created').values('created')[:1]
+    state = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(last_comment)
+    ).order_by().values_list(
+        'updated', 'last_comment', 'comments_count', 'views_count',
+        'author_id'
+    ).first()
+    if state is None:
+        return None
+    updated, last_comment, comments_count, views_count, author_id = state
+    return make_etag(
+        request, 'post', post_id, updated, last_comment, comments_count,
+        views_count, get_version('groups', 'users', f'author:{author_id}'),
+    )
@@ -0,0 +1,119 @@
+"""Счётчик просмотров постов с отложенной записью.
+
+UPDATE на каждый просмотр выстраивал бы читателей в очередь за
+блокировкой записи SQLite. Вместо этого просмотры копятся в памяти
+процесса, а фоновый поток раз в ``VIEW_COUNTS_FLUSH_INTERVAL`` секунд
+записывает их одним UPDATE ... CASE и ещё раз — при выходе процесса.
+Если запись не удалась, просмотры возвращаются в буфер до следующей.
+Теряются они только при аварийной остановке процесса.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# В CASE по два параметра на пост и ещё один в IN: держимся под
+# лимитом SQLite в 999 параметров.
+FLUSH_CHUNK = 300
+COUNTED_STATUSES = (200, 304)
+
+
+class ViewCounter:
+    def __init__(self):
+        self.pending = Counter()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+
+    def record(self, post_id):
+        with self.lock:
+            self.pending[post_id] += 1
+        if not settings.VIEW_COUNTS_FLUSH_INTERVAL:
+            self.flush()
+        elif settings.VIEW_COUNTS_FLUSH_THREAD:
+            self.start()
+
+    def start(self):
+        """Запустить фоновую запись, если в этом процессе её ещё нет."""
+        # После fork поток родителя в дочернем процессе не работает.
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.thread = threading.Thread(
+                target=self.run, name='post-views-flush', daemon=True)
+            self.thread.start()
+            atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            time.sleep(settings.VIEW_COUNTS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Сбой фоновой записи просмотров')
+            finally:
+                # Соединение потока не закрывает ни один запрос.
+                connection.close()
+
+    def flush(self):
+        """Записать накопленное; вернуть число обновлённых постов.
+
+        Ошибку базы не пробрасывает: незаписанное возвращается в буфер.
+        """
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+        items = list(pending.items())
+        for start in range(0, len(items), FLUSH_CHUNK):
+            chunk = dict(items[start:start + FLUSH_CHUNK])
+            try:
+                Post.objects.filter(pk__in=chunk).update(
+                    views_count=F('views_count') + Case(
+                        *(When(pk=pk, then=Value(count))
+                          for pk, count in chunk.items()),
+                        default=Value(0),
+                        output_field=IntegerField(),
+                    ))
+            except DatabaseError:
+                logger.exception(
+                    'Не удалось записать просмотры %s постов',
+                    len(items) - start)
+                with self.lock:
+                    self.pending.update(dict(items[start:]))
+                return start
+        return len(items)
+
+    def clear(self):
+        with self.lock:
+            self.pending.clear()
+
+
+post_views = ViewCounter()
+
+
+def count_view(view):
+    """Считать просмотр и тогда, когда страница ответит 304.
+
+    Ответы с ошибкой не считаются: иначе запросы несуществующих id
+    раздували бы буфер без предела.
+    """
+    @wraps(view)
+    def wrapper(request, post_id, *args, **kwargs):
+        response = view(request, post_id, *args, **kwargs)
+        if response.status_code in COUNTED_STATUSES:
+            post_views.record(post_id)
+        return response
+    return wrapper
@@ -0,0 +1,47 @@
+from django.core.cache import cache
+
+from core.cache import get_version
+
+from .models import Group
+
+GROUP_KEY = 'group_by_slug:{}:{}'
+GROUP_TIMEOUT = 60 * 60 * 24
+
+
+def count_key(feed, *namespaces):
+    """Ключ кэша COUNT(*) ленты. Поколения ``counts`` сдвигают только
+    создание и удаление постов и подписок (и перенос поста в другую
+    группу): правки и комментарии число записей не меняют."""
+    return f'{feed}:{get_version(*namespaces)}'
+
+
+def index_version():
+    return get_version('posts', 'groups')
+
+
+def trending_version():
+    return get_version('trending', 'posts', 'groups')
+
+
+def group_version(group):
+    return get_version(f'group:{group.pk}', 'users')
+
+
+def profile_version(author):
+    return get_version(f'author:{author.pk}', 'groups')
+
+
+def follow_version(user):
+    return get_version('posts', 'groups', f'follow:{user.pk}')
+
+
+def cached_group(slug):
+    """Группа по slug через кэш; любое сохранение группы сдвигает
+    поколение ``groups`` и старые записи перестают читаться."""
+    key = GROUP_KEY.format(slug, get_version('groups'))
+    group = cache.get(key)
+    if group is None:
+        group = Group.objects.filter(slug=slug).first()
+        if group is not None:
+            cache.set(key, group, GROUP_TIMEOUT)
+    return group
@@ -1,6 +1,16 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import describe_image, max_pixels, reencode_upload
 from .models import Comment, Post
+from .widgets import LazySelect
+
+NO_IMAGE = {
+    'image_width': None,
+    'image_height': None,
+    'image_color': '',
+    'image_placeholder': '',
+}
 
 
 class PostForm(forms.ModelForm):
@@ -12,6 +22,37 @@ class PostForm(forms.ModelForm):
             'group': 'Группа',
             'image': 'Картинка'
         }
+        widgets = {
+            'group': LazySelect('groups'),
+        }
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        # Размеры берутся из заголовка, который уже прочитал ImageField.
+        width, height = image.image.size
+        limit = max_pixels(image.image.format)
+        if width * height > limit:
+            raise forms.ValidationError(
+                'Слишком большая картинка: %(pixels)s пикселей, '
+                'можно не больше %(limit)s.',
+                code='too_many_pixels',
+                params={'pixels': width * height, 'limit': limit},
+            )
+        return reencode_upload(image)
+
+    def save(self, commit=True):
+        post = super().save(commit=False)
+        if 'image' in self.changed_data:
+            image = self.cleaned_data['image']
+            details = describe_image(image) if image else NO_IMAGE
+            for field, value in details.items():
+                setattr(post, field, value)
+        if commit:
+            post.save()
+            self._save_m2m()
+        return post
 
 
 class CommentForm(forms.ModelForm):
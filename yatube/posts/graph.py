@@ -0,0 +1,161 @@
+"""Граф подписок: проверки и списки без обхода всех подписок в Python."""
+from array import array
+from collections import Counter
+
+from django.conf import settings
+
+from .models import Follow, FollowSuggestion
+
+# Автор, которого читают те, кого читаю я, весит больше, чем автор,
+# которого читают люди с теми же подписками, что у меня.
+FRIEND_WEIGHT = 2
+COFOLLOW_WEIGHT = 1
+
+
+def is_following(user, author):
+    """Подписан ли ``user`` на ``author``: один поиск по уникальному
+    индексу (user, author)."""
+    if not user.is_authenticated or user.pk == author.pk:
+        return False
+    return Follow.objects.filter(user=user, author=author).exists()
+
+
+def followed_ids(user, author_ids):
+    """Кого из ``author_ids`` читает ``user`` — один запрос на страницу."""
+    if not user.is_authenticated or not author_ids:
+        return set()
+    return set(
+        Follow.objects.filter(user=user, author_id__in=author_ids)
+        .values_list('author_id', flat=True))
+
+
+def followers(author):
+    """Подписки на автора, новые первыми; подписчик — ``follow.user``."""
+    return Follow.objects.filter(
+        author=author).select_related('user').order_by('-pk')
+
+
+def following(user):
+    """Подписки пользователя, новые первыми; автор — ``follow.author``."""
+    return Follow.objects.filter(
+        user=user).select_related('author').order_by('-pk')
+
+
+def suggestions(user, limit=None):
+    """Готовые рекомендации одним запросом; тех, на кого пользователь
+    подписался после пересчёта, отсеивает подзапрос."""
+    if not user.is_authenticated:
+        return []
+    subscribed = Follow.objects.filter(user=user).values('author_id')
+    return list(
+        FollowSuggestion.objects.filter(user=user)
+        .exclude(author_id__in=subscribed)
+        .select_related('author')
+        .order_by('-score', 'pk')[:limit or settings.SUGGESTIONS_COUNT])
+
+
+def follow_edges(chunk_size):
+    """Пары (читатель, автор) пачками по первичному ключу — кортежи
+    вместо объектов модели."""
+    last_pk = 0
+    while True:
+        chunk = list(
+            Follow.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'user_id', 'author_id')[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1][0]
+
+
+class Adjacency:
+    """Разреженная матрица смежности в формате CSR на массивах ``array``.
+
+    Соседи вершины ``node`` — ``indices[indptr[node]:indptr[node + 1]]``,
+    номер вершины — первичный ключ пользователя. Внутри строки соседи идут
+    в порядке подписки, самые свежие в конце.
+    """
+
+    def __init__(self, rows, columns, size):
+        indptr = array('q', bytes(8 * (size + 1)))
+        for row in rows:
+            indptr[row + 1] += 1
+        for node in range(size):
+            indptr[node + 1] += indptr[node]
+        indices = array('q', bytes(8 * len(columns)))
+        position = array('q', indptr)
+        for row, column in zip(rows, columns):
+            indices[position[row]] = column
+            position[row] += 1
+        self.indptr = indptr
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def neighbours(self, node, limit=None):
+        start, end = self.indptr[node], self.indptr[node + 1]
+        if limit is not None:
+            start = max(start, end - limit)
+        return self.indices[start:end]
+
+    @property
+    def nbytes(self):
+        return sum(
+            len(part) * part.itemsize for part in (self.indptr, self.indices))
+
+
+class FollowGraph:
+    """Подписки в памяти: кого читает пользователь и кто читает его."""
+
+    def __init__(self, chunk_size=10000):
+        readers, authors = array('q'), array('q')
+        for chunk in follow_edges(chunk_size):
+            for pk, user_id, author_id in chunk:
+                readers.append(user_id)
+                authors.append(author_id)
+        size = max(max(readers, default=0), max(authors, default=0)) + 1
+        self.edges = len(readers)
+        self.following = Adjacency(readers, authors, size)
+        self.followers = Adjacency(authors, readers, size)
+
+    def __len__(self):
+        return len(self.following)
+
+    @property
+    def nbytes(self):
+        return self.following.nbytes + self.followers.nbytes
+
+    def scores(self, node, fanout=None):
+        """Друзья друзей и совместные подписки.
+
+        Друзья друзей — кого читают те, кого читаю я. Совместные
+        подписки — обход «мои подписки → их читатели → их подписки»:
+        читатели моих авторов похожи на меня тем сильнее, чем больше
+        у нас общих авторов, и их подписки весят столько же.
+
+        Кандидаты склеиваются в массивы, вес задаётся повтором массива,
+        а считает их ``Counter`` — циклы идут в C, а не в Python.
+        ``fanout`` ограничивает каждый шаг обхода: берутся самые свежие
+        соседи и самые похожие читатели, а звезда с миллионом читателей
+        не превращает один шаг в миллион.
+        """
+        friends = array('q')
+        similar = Counter()
+        for author in self.following.neighbours(node, fanout):
+            friends.extend(self.following.neighbours(author, fanout))
+            similar.update(self.followers.neighbours(author, fanout))
+        del similar[node]
+        cofollow = array('q')
+        for reader, overlap in similar.most_common(fanout):
+            authors = self.following.neighbours(reader, fanout)
+            cofollow.extend(authors * overlap)
+        scores = Counter(friends * FRIEND_WEIGHT + cofollow * COFOLLOW_WEIGHT)
+        del scores[node]
+        for author in self.following.neighbours(node):
+            del scores[author]
+        return scores
+
+    def suggest(self, node, top, fanout=None):
+        """Лучшие ``top`` кандидатов с весами."""
+        return self.scores(node, fanout).most_common(top)
@@ -0,0 +1,217 @@
+import base64
+import logging
+import os
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, ImageFilter, ImageOps
+from sorl.thumbnail import default, delete, get_thumbnail
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from core.queries import uncounted
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_SIZE = 16
+# Форматы, которые Image.draft() умеет декодировать сразу уменьшенными.
+DRAFT_FORMATS = ('JPEG',)
+ORIENTATION = 0x0112
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True},
+    'PNG': {'optimize': True},
+    'GIF': {},
+    'WEBP': {'quality': 85},
+}
+
+
+def field_file(name):
+    field = Post._meta.get_field('image')
+    return field.attr_class(None, field, name)
+
+
+def stored(image):
+    try:
+        return image.storage.exists(image.name)
+    except SuspiciousFileOperation:
+        return False
+
+
+def release_image(name):
+    """Удалить картинку и её миниатюры, если она больше ни у кого
+    не стоит: одинаковые загрузки делят один файл.
+
+    Загрузка тех же байтов может закоммитить ссылку сразу после проверки.
+    Поэтому файл сначала откладывается в сторону, ссылки проверяются ещё
+    раз, и только потом файл удаляется. Ссылку, закоммиченную позже
+    второй проверки, чинит ``ContentAddressedStorage.restore``.
+    """
+    image = field_file(name)
+    if not image or not stored(image):
+        return False
+    if Post.objects.filter(image=name).exists():
+        return False
+    path = image.storage.path(name)
+    released = f'{path}.{uuid.uuid4().hex}.released'
+    try:
+        os.rename(path, released)
+    except FileNotFoundError:
+        return False
+    if Post.objects.filter(image=name).exists():
+        os.replace(released, path)
+        return False
+    delete(image, delete_file=False)
+    os.remove(released)
+    return True
+
+
+def generate_thumbnails(image):
+    """Построить все миниатюры из ``POST_THUMBNAILS`` и записать их в
+    key-value хранилище sorl, чтобы шаблоны не открывали оригинал."""
+    if not image or not stored(image):
+        return []
+    thumbnails = []
+    for geometry, options in settings.POST_THUMBNAILS:
+        try:
+            thumbnails.append(get_thumbnail(image, geometry, **options))
+        except (OSError, ValueError):
+            logger.exception('Не удалось построить миниатюру %s для %s',
+                             geometry, image.name)
+    return thumbnails
+
+
+def read_kvstore(keys):
+    """Значения ключей хранилища sorl: из кэша, промахи — одним запросом."""
+    store = default.kvstore
+    found = store.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        loaded = dict(KVStore.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        store.cache.set_many(
+            loaded, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(loaded)
+    return found
+
+
+def prefetch_thumbnails(images):
+    """Прогреть кэш sorl миниатюрами картинок страницы.
+
+    На холодном кэше ``{% thumbnail %}`` читает thumbnail_kvstore
+    отдельным запросом на каждую карточку. Здесь списки миниатюр
+    картинок и сами миниатюры читаются двумя запросами на страницу.
+    """
+    sources = {
+        add_prefix(ImageFile(image).key, 'thumbnails'): image
+        for image in images if image}
+    if not sources:
+        return
+    lists = read_kvstore(sorted(sources))
+    thumbnails = set()
+    for key, image in sources.items():
+        value = lists.get(key)
+        # Кэш хранит и заглушку «ключа нет» — она не строка.
+        if isinstance(value, str):
+            thumbnails.update(
+                add_prefix(thumbnail) for thumbnail in deserialize(value))
+        else:
+            # Миниатюры не построились после загрузки. Разовая починка не
+            # входит в бюджет; без неё шаблон строил бы их сам, запросами
+            # на каждую карточку.
+            with uncounted():
+                generate_thumbnails(image)
+    if thumbnails:
+        read_kvstore(sorted(thumbnails))
+
+
+def describe_image(file):
+    """Размеры, основной цвет и размытая заглушка загруженной картинки."""
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        # JPEG декодируется сразу в уменьшенном масштабе.
+        image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+        small = image.convert('RGB')
+    file.seek(0)
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    color = small.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+    buffer = BytesIO()
+    small.filter(ImageFilter.GaussianBlur(1)).save(
+        buffer, 'JPEG', quality=40)
+    placeholder = base64.b64encode(buffer.getvalue()).decode()
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_color': '#{:02x}{:02x}{:02x}'.format(*color),
+        'image_placeholder': f'data:image/jpeg;base64,{placeholder}',
+    }
+
+
+class ReencodedUpload(TemporaryUploadedFile):
+    """Пережатая картинка во временном файле.
+
+    Хранилище переносит временный файл на место, а закрыть его некому:
+    его нет в request.FILES. Закрываем сами, TemporaryUploadedFile.close()
+    переживает уже перенесённый файл.
+    """
+
+    def __del__(self):
+        self.close()
+
+
+def max_pixels(image_format):
+    """Предел пикселей по заголовку: без draft() картинка декодируется
+    в полном размере, и память растёт вместе с числом пикселей."""
+    if image_format in DRAFT_FORMATS:
+        return settings.POST_IMAGE_MAX_PIXELS
+    return min(settings.POST_IMAGE_MAX_PIXELS,
+               settings.POST_IMAGE_MAX_PIXELS_FULL_DECODE)
+
+
+def fit_size(size):
+    # draft() уменьшает JPEG, только пока обе стороны не меньше заданных.
+    width, height = size
+    max_width, max_height = settings.POST_IMAGE_MAX_SIZE
+    ratio = min(max_width / width, max_height / height, 1)
+    return round(width * ratio), round(height * ratio)
+
+
+def reencode_upload(upload):
+    """Уменьшить загруженную картинку до ``POST_IMAGE_MAX_SIZE`` и
+    пережать её без метаданных во временный файл на диске.
+
+    JPEG декодируется сразу в уменьшенном масштабе, и память ограничена
+    размером результата. Остальные форматы декодируются целиком — их
+    размер заранее ограничивает ``max_pixels``. Анимации возвращаются
+    как есть.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if getattr(image, 'is_animated', False):
+            upload.seek(0)
+            return upload
+        source_format = image.format
+        image.draft(image.mode, fit_size(image.size))
+        if image.getexif().get(ORIENTATION):
+            image = ImageOps.exif_transpose(image)
+        image.thumbnail(settings.POST_IMAGE_MAX_SIZE)
+        image_format = (
+            source_format if source_format in SAVE_OPTIONS else 'PNG')
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        name = upload.name
+        if image_format != source_format:
+            name = os.path.splitext(name)[0] + '.png'
+        result = ReencodedUpload(name, Image.MIME[image_format], 0, None)
+        image.save(result.file, image_format, **SAVE_OPTIONS[image_format])
+    result.size = result.file.tell()
+    result.seek(0)
+    return result
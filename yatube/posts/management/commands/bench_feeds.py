@@ -0,0 +1,131 @@
+import gc
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from posts.models import Group, Post, User, make_excerpt
+from posts.rows import post_rows
+from posts.templatetags.feed import CARD_TEMPLATE
+
+ORDERING = ('-pub_date', '-pk')
+
+
+def load_models(size):
+    return list(
+        Post.objects.select_related('author', 'group')
+        .order_by(*ORDERING)[:size])
+
+
+def load_rows(size):
+    return list(post_rows(Post.objects.order_by(*ORDERING))[:size])
+
+
+MODES = {
+    'модели Post': load_models,
+    'PostRow': load_rows,
+}
+
+
+def retained_size(load, size):
+    """Сколько байт держит загруженная страница, пока она жива."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    page = load(size)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del page
+    return after - before
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def render_cards(page):
+    for post in page:
+        render_to_string(CARD_TEMPLATE, {'post': post})
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает страницу ленты из моделей Post и из облегчённых '
+            'PostRow: память страницы, время загрузки и рендера карточек. '
+            'Тестовые посты откатываются после замера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=1000,
+            help='Сколько постов создать перед замером.')
+        parser.add_argument(
+            '--text-length', type=int, default=2000,
+            help='Длина текста каждого поста в символах.')
+        parser.add_argument(
+            '--page-size', type=int, default=settings.POSTS_COUNT,
+            help='Сколько постов на странице.')
+        parser.add_argument(
+            '--runs', type=int, default=20,
+            help='Сколько раз повторить замер времени.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['posts'], options['text_length'])
+            for name, load in MODES.items():
+                self.stdout.write(
+                    f'{name}: {self.measure(load, options)}')
+            transaction.set_rollback(True)
+
+    def measure(self, load, options):
+        size = options['page_size']
+        load(size)
+        memory = retained_size(load, size)
+        loads, renders = [], []
+        for run in range(options['runs']):
+            page, elapsed = timed(load, size)
+            loads.append(elapsed)
+            renders.append(timed(render_cards, page)[1])
+        return (f'страница {memory / 1024:.1f} КБ, '
+                f'загрузка {statistics.median(loads) * 1000:.2f} мс, '
+                f'рендер {statistics.median(renders) * 1000:.2f} мс')
+
+    def seed(self, count, text_length):
+        users = [
+            User.objects.create_user(
+                username=f'bench_user_{number}', first_name='Имя',
+                last_name='Фамилия')
+            for number in range(10)
+        ]
+        groups = [
+            Group.objects.create(
+                title=f'Группа {number}', slug=f'bench-group-{number}',
+                description='Группа для замера')
+            for number in range(3)
+        ]
+        text = ('Длинный текст поста для замера. ' * text_length)[
+            :text_length]
+        # bulk_create обходит Post.save, начало текста заполняем сами.
+        excerpt, is_truncated = make_excerpt(text)
+        now = timezone.now()
+        Post.objects.bulk_create(
+            (
+                Post(
+                    text=text,
+                    excerpt=excerpt,
+                    is_truncated=is_truncated,
+                    author=users[number % len(users)],
+                    group=groups[number % len(groups)],
+                    pub_date=now - timedelta(minutes=number),
+                    updated=now,
+                )
+                for number in range(count)
+            ),
+            batch_size=500,
+        )
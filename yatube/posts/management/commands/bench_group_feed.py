@@ -0,0 +1,109 @@
+import gc
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.cache import bump
+from posts.models import Group, Post, User, make_excerpt
+from posts.paginators import CursorPaginator
+
+FRAGMENTS_OFF = {
+    **settings.CACHES,
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = ('Наращивает одну группу до заданных размеров и замеряет время '
+            'ответа ленты группы: первая страница, последняя нумерованная '
+            'и самая дальняя по курсору. Данные откатываются после замера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+            help='Размеры группы (число постов), по возрастанию.')
+        parser.add_argument(
+            '--runs', type=int, default=20,
+            help='Сколько раз повторить каждый запрос.')
+
+    def handle(self, *args, **options):
+        sizes = options['sizes']
+        if sizes != sorted(sizes):
+            raise CommandError('Размеры нужно перечислить по возрастанию.')
+        with transaction.atomic():
+            author = User.objects.create_user(username='bench_group_author')
+            group = Group.objects.create(
+                title='Замер', slug='bench-group-feed',
+                description='Группа для замера')
+            url = reverse('posts:group_list', args=[group.slug])
+            client = Client()
+            created = 0
+            for size in sizes:
+                self.grow(group, author, created, size)
+                created = size
+                # Фрагменты шаблона не кэшируются: меряется сборка
+                # страницы, а не отдача готового HTML.
+                with override_settings(CACHES=FRAGMENTS_OFF):
+                    report = self.measure(client, url, options)
+                self.stdout.write(f'{size} постов: {report}')
+            transaction.set_rollback(True)
+
+    def measure(self, client, url, options):
+        paginator = CursorPaginator(Post.objects.none(), 1)
+        pages = {
+            'первая': {},
+            'последняя нумерованная': {
+                'page': settings.NUMBERED_PAGES_LIMIT},
+            'последняя': {'cursor': paginator.last_cursor},
+        }
+        gc.collect()
+        cache.clear()
+        cold = self.timed(client, url, {})
+        results = [f'первая с холодным кэшем {cold * 1000:.1f} мс']
+        for name, params in pages.items():
+            samples = [
+                self.timed(client, url, params)
+                for run in range(options['runs'])
+            ]
+            results.append(
+                f'{name} {statistics.median(samples) * 1000:.1f} мс')
+        return ', '.join(results)
+
+    def timed(self, client, url, params):
+        started = time.perf_counter()
+        response = client.get(url, params)
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(f'{url} ответил {response.status_code}')
+        return elapsed
+
+    def grow(self, group, author, start, size):
+        excerpt, is_truncated = make_excerpt('Пост для замера')
+        now = timezone.now()
+        Post.objects.bulk_create(
+            (
+                Post(
+                    text='Пост для замера',
+                    excerpt=excerpt,
+                    is_truncated=is_truncated,
+                    author=author,
+                    group=group,
+                    pub_date=now - timedelta(seconds=number),
+                    updated=now,
+                )
+                for number in range(start, size)
+            ),
+            batch_size=500,
+        )
+        # bulk_create обходит сигналы, поколение ленты сдвигаем сами.
+        bump('posts', f'group:{group.pk}')
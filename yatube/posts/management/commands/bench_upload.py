@@ -0,0 +1,122 @@
+import math
+import os
+import resource
+import tempfile
+import time
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from posts.forms import PostForm
+
+
+class DiskUpload(UploadedFile):
+    """Загрузка, которую Django уже сбросил во временный файл."""
+
+    def __init__(self, path):
+        super().__init__(open(path, 'rb'), os.path.basename(path),
+                         'application/octet-stream', os.path.getsize(path))
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def make_image(path, megapixels, image_format):
+    width = int(math.sqrt(megapixels * 1_000_000 * 4 / 3))
+    height = width * 3 // 4
+    image = Image.radial_gradient('L').resize((width, height)).convert('RGB')
+    image.save(path, image_format)
+    return width, height
+
+
+def full_decode(path):
+    with Image.open(path) as image:
+        image.load()
+    return True
+
+
+def pipeline(path):
+    upload = DiskUpload(path)
+    form = PostForm(data={'text': 'Замер'}, files={'image': upload})
+    accepted = form.is_valid()
+    if accepted:
+        form.cleaned_data['image'].close()
+    upload.close()
+    return accepted
+
+
+def measure(task):
+    """Прирост пикового RSS процесса за одну обработку, в КБ, время
+    и приняла ли картинку форма."""
+    name, path, warmup_path = task
+    # Прогрев: ленивые импорты и переводы не должны попасть в замер.
+    MODES[name](warmup_path)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.monotonic()
+    accepted = MODES[name](path)
+    elapsed = time.monotonic() - started
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return after - before, elapsed, accepted
+
+
+MODES = {
+    'полное декодирование': full_decode,
+    'конвейер загрузки': pipeline,
+}
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пиковую память процесса при загрузке большой '
+            'картинки через PostForm и при её полном декодировании. '
+            'JPEG уменьшается при декодировании, PNG — нет, поэтому '
+            'замеряются оба.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--megapixels', type=float, default=20,
+            help='Размер тестовой JPEG-картинки в мегапикселях.')
+        parser.add_argument(
+            '--png-megapixels', type=float,
+            default=settings.POST_IMAGE_MAX_PIXELS_FULL_DECODE / 1_000_000,
+            help='Размер тестовой PNG-картинки в мегапикселях; по умолчанию '
+                 'самая большая, которую примет форма.')
+        parser.add_argument(
+            '--runs', type=int, default=3,
+            help='Сколько раз повторить каждый замер.')
+
+    def handle(self, *args, **options):
+        cases = (
+            ('JPEG', 'jpg', options['megapixels']),
+            ('PNG', 'png', options['png_megapixels']),
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for image_format, extension, megapixels in cases:
+                self.bench(directory, image_format, extension, megapixels,
+                           options['runs'])
+
+    def bench(self, directory, image_format, extension, megapixels, runs):
+        path = os.path.join(directory, f'bench.{extension}')
+        warmup_path = os.path.join(directory, f'warmup.{extension}')
+        Image.new('RGB', (16, 16)).save(warmup_path, image_format)
+        # Каждый замер — в свежем процессе, чтобы пики не смешивались.
+        with Pool(1, maxtasksperchild=1) as pool:
+            width, height = pool.apply(
+                make_image, (path, megapixels, image_format))
+        self.stdout.write(
+            f'{image_format} {width}x{height}, '
+            f'{os.path.getsize(path) // 1024} КБ на диске')
+        for name in MODES:
+            tasks = [(name, path, warmup_path)] * runs
+            with Pool(1, maxtasksperchild=1) as pool:
+                results = pool.map(measure, tasks, chunksize=1)
+            peak = max(rss for rss, _, _ in results)
+            elapsed = sum(seconds for _, seconds, _ in results)
+            verdict = '' if all(
+                accepted for _, _, accepted in results) else ', отклонена'
+            self.stdout.write(
+                f'  {name}: пик RSS +{peak / 1024:.1f} МБ, '
+                f'{elapsed / len(results):.2f} с на загрузку{verdict}')
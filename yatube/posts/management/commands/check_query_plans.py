@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.trending import update_scores
+
+
+def is_bad_step(step):
+    # «SCAN t» без «USING ... INDEX» — полный проход по таблице.
+    full_scan = (
+        step.startswith('SCAN ')
+        and 'USING' not in step
+        and 'CONSTANT ROW' not in step
+    )
+    return full_scan or 'USE TEMP B-TREE' in step
+
+
+class Command(BaseCommand):
+    help = ('Открывает страницы ленты на заполненной базе и проверяет '
+            'EXPLAIN QUERY PLAN всех их запросов: полный проход таблицы '
+            'или сортировка во временном B-дереве считаются ошибкой.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=500, metavar='POSTS',
+            help='Сколько постов создать перед проверкой (0 — не создавать). '
+                 'Данные откатываются после проверки.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка планов написана для SQLite.')
+        with transaction.atomic():
+            problems = self.check_views(options['seed'])
+            transaction.set_rollback(True)
+        if problems:
+            for url, sql, detail in problems:
+                self.stderr.write(f'{url}: {detail}\n    {sql}')
+            raise CommandError(f'Плохих планов: {len(problems)}')
+        self.stdout.write(self.style.SUCCESS('Все планы используют индексы.'))
+
+    def check_views(self, seed):
+        if seed:
+            self.seed(seed)
+        reader = User.objects.order_by('pk').first()
+        post = Post.objects.order_by('-comments_count').first()
+        if reader is None or post is None:
+            raise CommandError('База пуста: запустите с --seed.')
+        client = Client()
+        client.force_login(reader)
+        problems = []
+        for url in self.urls(reader, post):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url} ответил {response.status_code}')
+            for query in queries:
+                problems.extend(
+                    (url, query['sql'], detail)
+                    for detail in self.bad_steps(query['sql']))
+        return problems
+
+    def urls(self, reader, post):
+        author = post.author
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=3',
+            reverse('posts:profile', args=[author.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+            reverse('posts:follow_index'),
+            reverse('posts:followers', args=[author.username]),
+            reverse('posts:following', args=[reader.username]),
+            reverse('posts:trending'),
+            reverse('posts:hot_groups'),
+        ]
+        if post.group_id:
+            urls.append(reverse('posts:group_list', args=[post.group.slug]))
+        return urls
+
+    def bad_steps(self, sql):
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            steps = [row[-1] for row in cursor.fetchall()]
+        return [step for step in steps if is_bad_step(step)]
+
+    def seed(self, count):
+        users = [
+            User.objects.create_user(username=f'plan_user_{number}')
+            for number in range(10)
+        ]
+        groups = [
+            Group.objects.create(
+                title=f'Группа {number}', slug=f'plan-group-{number}',
+                description='Группа для проверки планов')
+            for number in range(3)
+        ]
+        now = timezone.now()
+        Post.objects.bulk_create(
+            Post(
+                text=f'Пост {number}',
+                excerpt=f'Пост {number}',
+                author=users[number % len(users)],
+                group=groups[number % len(groups)],
+                pub_date=now - timedelta(minutes=number),
+                updated=now,
+            )
+            for number in range(count)
+        )
+        for author in users[1:]:
+            Follow.objects.create(user=users[0], author=author)
+        post = Post.objects.first()
+        for number in range(20):
+            Comment.objects.create(
+                post=post, author=users[number % len(users)], text='Да')
+        update_scores()
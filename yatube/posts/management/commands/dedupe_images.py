@@ -0,0 +1,69 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import delete
+
+from core.cache import bump
+from posts.images import field_file, generate_thumbnails
+from posts.models import Post
+from posts.signals import post_namespaces
+
+
+def walk(storage, directory):
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield os.path.join(directory, name)
+    for name in directories:
+        yield from walk(storage, os.path.join(directory, name))
+
+
+class Command(BaseCommand):
+    help = ('Переименовывает картинки постов по хэшу содержимого: '
+            'одинаковые файлы сливаются в один, ссылки постов обновляются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не меняя.')
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        storage = field.storage
+        root = field.upload_to.rstrip('/')
+        if not storage.exists(root):
+            self.stdout.write('Картинок нет.')
+            return
+        scanned = moved = duplicates = freed = 0
+        targets = set()
+        for name in list(walk(storage, root)):
+            scanned += 1
+            flat_name = os.path.join(root, os.path.basename(name))
+            with storage.open(name) as file:
+                target = storage.hashed_name(flat_name, file)
+                if target == name:
+                    continue
+                moved += 1
+                if target in targets or storage.exists(target):
+                    duplicates += 1
+                    freed += storage.size(name)
+                targets.add(target)
+                if not options['dry_run']:
+                    storage.save(flat_name, file)
+            if not options['dry_run']:
+                self.relink(name, target)
+        self.stdout.write(
+            f'Файлов: {scanned}, перенесено: {moved}, '
+            f'дубликатов: {duplicates}, освобождено: {freed // 1024} КБ')
+
+    def relink(self, name, target):
+        posts = Post.objects.filter(image=name)
+        namespaces = set()
+        for author_id, group_id in posts.values_list('author_id', 'group_id'):
+            namespaces |= post_namespaces(author_id, group_id)
+        # updated сдвигается, чтобы карточки со старым адресом устарели.
+        posts.update(image=target, updated=timezone.now())
+        delete(field_file(name))
+        generate_thumbnails(field_file(target))
+        if namespaces:
+            bump(*namespaces)
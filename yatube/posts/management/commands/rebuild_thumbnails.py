@@ -0,0 +1,137 @@
+import logging
+import os
+import time
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.dateparse import parse_date
+from sorl.thumbnail import delete
+
+from posts.images import (describe_image, field_file, generate_thumbnails,
+                          stored)
+from posts.models import Group, Post
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild(task):
+    """Перестроить миниатюры одного поста; выполняется в процессе пула.
+
+    Любая ошибка — например, «database is locked», когда процессы пишут
+    хранилище sorl в один файл SQLite, — считается неудачей этого поста
+    и не прерывает весь запуск.
+    """
+    pk, name, force, describe = task
+    try:
+        image = field_file(name)
+        if force:
+            delete(image, delete_file=False)
+        thumbnails = generate_thumbnails(image)
+        details = None
+        if describe and stored(image):
+            with image.storage.open(name) as file:
+                details = describe_image(file)
+    except Exception:
+        logger.exception('Не удалось перестроить миниатюры поста %s', pk)
+        return pk, False, None
+    return pk, len(thumbnails) == len(settings.POST_THUMBNAILS), details
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает миниатюры всех изображений постов в нескольких '
+            'процессах и заполняет недостающие размеры и заглушки. '
+            'Прерванный запуск продолжается с места остановки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов (1 — без пула).')
+        parser.add_argument(
+            '--since', type=parse_date, metavar='YYYY-MM-DD',
+            help='Только посты, опубликованные в этот день или позже.')
+        parser.add_argument(
+            '--until', type=parse_date, metavar='YYYY-MM-DD',
+            help='Только посты, опубликованные в этот день или раньше.')
+        parser.add_argument(
+            '--group', metavar='SLUG',
+            help='Только посты группы.')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Удалить готовые миниатюры и построить их заново.')
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.MEDIA_ROOT, '.rebuild_thumbnails'),
+            help='Файл с номерами уже обработанных постов.')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Не продолжать прошлый запуск, а начать сначала.')
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        if options['restart'] and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        done = self.load_checkpoint(checkpoint)
+        posts = self.posts(options).values_list('pk', 'image', 'image_width')
+        tasks = [
+            (pk, name, options['force'], width is None)
+            for pk, name, width in posts
+            if pk not in done
+        ]
+        if done:
+            self.stdout.write(f'Продолжаем: уже готово {len(done)}')
+        started = time.monotonic()
+        failed = self.run(tasks, options['workers'], checkpoint)
+        elapsed = time.monotonic() - started
+        rate = len(tasks) / elapsed if elapsed else 0
+        self.stdout.write(
+            f'Обработано: {len(tasks)}, с ошибками: {failed}, '
+            f'{elapsed:.1f} с, {rate:.1f} изобр./с')
+        if not failed and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    def posts(self, options):
+        posts = Post.objects.exclude(image='').order_by('pk')
+        if options['since']:
+            posts = posts.filter(pub_date__date__gte=options['since'])
+        if options['until']:
+            posts = posts.filter(pub_date__date__lte=options['until'])
+        if options['group']:
+            if not Group.objects.filter(slug=options['group']).exists():
+                raise CommandError(f'Нет группы {options["group"]}')
+            posts = posts.filter(group__slug=options['group'])
+        return posts
+
+    def run(self, tasks, workers, checkpoint):
+        if workers > 1:
+            # Дочерние процессы не должны делить соединение родителя.
+            connections.close_all()
+            with Pool(workers) as pool:
+                return self.collect(
+                    pool.imap_unordered(rebuild, tasks, chunksize=8),
+                    len(tasks), checkpoint)
+        return self.collect(map(rebuild, tasks), len(tasks), checkpoint)
+
+    def collect(self, results, total, checkpoint):
+        failed = 0
+        os.makedirs(os.path.dirname(checkpoint) or '.', exist_ok=True)
+        with open(checkpoint, 'a') as log:
+            for number, (pk, ok, details) in enumerate(results, 1):
+                if details:
+                    Post.objects.filter(pk=pk).update(**details)
+                if ok:
+                    log.write(f'{pk}\n')
+                    log.flush()
+                else:
+                    failed += 1
+                self.stdout.write(f'\r{number}/{total}', ending='')
+        if total:
+            self.stdout.write('')
+        return failed
+
+    def load_checkpoint(self, checkpoint):
+        if not os.path.exists(checkpoint):
+            return set()
+        with open(checkpoint) as log:
+            return {int(line) for line in log if line.strip()}
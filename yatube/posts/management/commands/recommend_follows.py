@@ -0,0 +1,112 @@
+import random
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.cache import bump
+from posts.graph import FollowGraph
+from posts.models import Follow, FollowSuggestion, User
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации «кого почитать» по графу подписок: '
+            'друзья друзей и подписки людей, читающих тех же авторов. '
+            'С --bench-edges сначала создаёт случайный граф заданного '
+            'размера и откатывает его после замера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=settings.SUGGESTIONS_COUNT * 4,
+            help='Сколько рекомендаций хранить на пользователя.')
+        parser.add_argument(
+            '--fanout', type=int, default=100,
+            help='Через сколько свежих подписок идти на каждом шаге.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Сколько подписок читать из базы за один запрос.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Для скольких пользователей писать рекомендации '
+                 'в одной транзакции.')
+        parser.add_argument(
+            '--bench-edges', type=int, default=0,
+            help='Создать случайный граф с таким числом подписок.')
+        parser.add_argument(
+            '--trace-memory', action='store_true',
+            help='Замерить пик памяти через tracemalloc (медленнее).')
+
+    def handle(self, *args, **options):
+        if not options['bench_edges']:
+            self.run(options)
+            return
+        with transaction.atomic():
+            self.seed(options['bench_edges'])
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        if options['trace_memory']:
+            tracemalloc.start()
+        started = time.perf_counter()
+        graph = FollowGraph(options['chunk_size'])
+        loaded = time.perf_counter()
+        stored = self.store(graph, options)
+        finished = time.perf_counter()
+        bump('suggestions')
+        self.stdout.write(
+            f'Подписок: {graph.edges}, пользователей: {len(graph)}, '
+            f'рекомендаций: {stored}')
+        self.stdout.write(
+            f'Загрузка {loaded - started:.2f} с, '
+            f'расчёт и запись {finished - loaded:.2f} с, '
+            f'матрицы {graph.nbytes / 2 ** 20:.1f} МБ')
+        if options['trace_memory']:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.stdout.write(f'Пик памяти {peak / 2 ** 20:.1f} МБ')
+
+    def store(self, graph, options):
+        size = options['batch_size']
+        stored = 0
+        for start in range(0, len(graph), size):
+            nodes = range(start, min(start + size, len(graph)))
+            rows = [
+                FollowSuggestion(user_id=node, author_id=author, score=score)
+                for node in nodes
+                for author, score in graph.suggest(
+                    node, options['top'], options['fanout'])
+            ]
+            with transaction.atomic():
+                FollowSuggestion.objects.filter(
+                    user_id__gte=nodes.start, user_id__lt=nodes.stop
+                ).delete()
+                FollowSuggestion.objects.bulk_create(rows, batch_size=500)
+            stored += len(rows)
+        FollowSuggestion.objects.filter(user_id__gte=len(graph)).delete()
+        return stored
+
+    def seed(self, edges, degree=50):
+        # bulk_create обходит сигналы: ни счётчиков, ни ленты для
+        # временного графа не нужно.
+        count = max(edges // degree, degree + 1)
+        first = (User.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0) + 1
+        User.objects.bulk_create(
+            (User(username=f'bench_reader_{number}')
+             for number in range(count)),
+            batch_size=500)
+        ids = list(User.objects.filter(pk__gte=first).values_list(
+            'pk', flat=True))
+        generator = random.Random(0)
+        Follow.objects.bulk_create(
+            (Follow(user_id=user_id, author_id=author_id)
+             for index, user_id in enumerate(ids)
+             if index * degree < edges
+             for author_id in generator.sample(ids, degree)
+             if author_id != user_id),
+            batch_size=500,
+            ignore_conflicts=True,
+        )
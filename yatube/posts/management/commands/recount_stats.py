@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import AuthorStats, Comment, Follow, Post, User
+
+
+def count_by(queryset, field, ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': ids})
+        .order_by()
+        .values_list(field)
+        .annotate(total=Count('pk'))
+    )
+
+
+def chunks(queryset, size):
+    last_pk = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, подписчиков, подписок '
+            'и комментариев, исправляя расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько строк пересчитывать за одну транзакцию.')
+
+    def handle(self, *args, **options):
+        size = options['chunk_size']
+        fixed = 0
+        for ids in chunks(User.objects.all(), size):
+            fixed += self.recount_authors(ids)
+        for ids in chunks(Post.objects.all(), size):
+            fixed += self.recount_posts(ids)
+        self.stdout.write(f'Исправлено счётчиков: {fixed}')
+
+    @transaction.atomic
+    def recount_authors(self, ids):
+        posts = count_by(Post.objects.all(), 'author', ids)
+        followers = count_by(Follow.objects.all(), 'author', ids)
+        following = count_by(Follow.objects.all(), 'user', ids)
+        stats = AuthorStats.objects.select_for_update().in_bulk(ids)
+        changed = []
+        for user_id in ids:
+            actual = {
+                'posts_count': posts.get(user_id, 0),
+                'followers_count': followers.get(user_id, 0),
+                'following_count': following.get(user_id, 0),
+            }
+            row = stats.get(user_id) or AuthorStats(user_id=user_id)
+            if row.pk in stats and all(
+                getattr(row, field) == value
+                for field, value in actual.items()
+            ):
+                continue
+            for field, value in actual.items():
+                setattr(row, field, value)
+            changed.append(row)
+        AuthorStats.objects.bulk_create(
+            [row for row in changed if row.pk not in stats])
+        AuthorStats.objects.bulk_update(
+            [row for row in changed if row.pk in stats],
+            ['posts_count', 'followers_count', 'following_count'])
+        return len(changed)
+
+    @transaction.atomic
+    def recount_posts(self, ids):
+        comments = count_by(Comment.objects.all(), 'post', ids)
+        changed = []
+        for post in Post.objects.select_for_update().filter(
+                pk__in=ids).only('pk', 'comments_count'):
+            actual = comments.get(post.pk, 0)
+            if post.comments_count != actual:
+                post.comments_count = actual
+                changed.append(post)
+        Post.objects.bulk_update(changed, ['comments_count'])
+        return len(changed)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.cache import bump
+from posts.trending import update_scores
+
+
+class Command(BaseCommand):
+    help = ('Дописывает рейтинги «Популярного» для новых постов и постов '
+            'с новыми комментариями и просмотрами. Запускать по расписанию.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов обновлять за одну транзакцию.')
+
+    def handle(self, *args, **options):
+        updated = update_scores(options['batch_size'])
+        if updated:
+            bump('trending')
+        self.stdout.write(f'Обновлено рейтингов: {updated}')
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+from posts.search import (AUTHOR, GROUP, SEARCH_TABLE, drop_triggers,
+                          install_triggers)
+
+
+def create_triggers(apps, schema_editor):
+    install_triggers(schema_editor.connection)
+
+
+def remove_triggers(apps, schema_editor):
+    drop_triggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0012_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                f'CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5('
+                'text, author, group_title, '
+                "tokenize='unicode61 remove_diacritics 2')",
+                f'INSERT INTO {SEARCH_TABLE} '
+                '(rowid, text, author, group_title) '
+                f"SELECT id, text, {AUTHOR.format(post='posts_post')}, "
+                f"{GROUP.format(post='posts_post')} FROM posts_post",
+            ],
+            f'DROP TABLE {SEARCH_TABLE}',
+        ),
+        migrations.RunPython(create_triggers, remove_triggers),
+    ]
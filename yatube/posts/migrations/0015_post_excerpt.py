@@ -0,0 +1,52 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+from posts.search import drop_triggers, install_triggers
+
+EXCERPT_LENGTH = 300
+
+
+def create_triggers(apps, schema_editor):
+    install_triggers(schema_editor.connection)
+
+
+def remove_triggers(apps, schema_editor):
+    drop_triggers(schema_editor.connection)
+
+
+def fill_excerpts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = []
+    for post in Post.objects.only('pk', 'text').iterator():
+        post.is_truncated = len(post.text) > EXCERPT_LENGTH
+        post.excerpt = post.text
+        if post.is_truncated:
+            post.excerpt = post.text[:EXCERPT_LENGTH - 1].rstrip() + '…'
+        posts.append(post)
+    Post.objects.bulk_update(
+        posts, ['excerpt', 'is_truncated'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_comment_tree'),
+    ]
+
+    operations = [
+        # Пересборка posts_post ломается о поисковые триггеры.
+        migrations.RunPython(remove_triggers, create_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300, verbose_name='Начало текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='is_truncated',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Текст обрезан'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+        migrations.RunPython(create_triggers, remove_triggers),
+    ]
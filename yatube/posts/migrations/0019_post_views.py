@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+from posts.search import drop_triggers, install_triggers
+
+
+def create_triggers(apps, schema_editor):
+    install_triggers(schema_editor.connection)
+
+
+def remove_triggers(apps, schema_editor):
+    drop_triggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_scores'),
+    ]
+
+    operations = [
+        # Пересборка posts_post ломается о поисковые триггеры.
+        migrations.RunPython(remove_triggers, create_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='views_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Количество просмотров'),
+        ),
+        migrations.AddField(
+            model_name='postscore',
+            name='views_seen',
+            field=models.IntegerField(default=0, verbose_name='Учтено просмотров'),
+        ),
+        migrations.RunPython(create_triggers, remove_triggers),
+    ]
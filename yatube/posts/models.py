@@ -1,10 +1,21 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
 
 from core.models import CreatedModel
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 
+EXCERPT_LENGTH = 300
+
+
+def make_excerpt(text):
+    """Начало текста для лент и признак того, что текст обрезан."""
+    if len(text) <= EXCERPT_LENGTH:
+        return text, False
+    return text[:EXCERPT_LENGTH - 1].rstrip() + '…', True
+
 
 class Post(models.Model):
     text = models.TextField(
@@ -15,6 +26,10 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -32,17 +47,77 @@ class Post(models.Model):
     )
     image = models.ImageField(
         upload_to='posts/',
-        blank=True
+        storage=ContentAddressedStorage(),
+        blank=True,
+        db_index=True
+    )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_color = models.CharField(
+        'Основной цвет картинки',
+        max_length=7,
+        blank=True,
+        editable=False
+    )
+    image_placeholder = models.TextField(
+        'Размытая заглушка картинки',
+        blank=True,
+        editable=False
+    )
+    comments_count = models.IntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    views_count = models.IntegerField(
+        'Количество просмотров',
+        default=0,
+        editable=False
+    )
+    excerpt = models.CharField(
+        'Начало текста',
+        max_length=EXCERPT_LENGTH,
+        blank=True,
+        editable=False
+    )
+    is_truncated = models.BooleanField(
+        'Текст обрезан',
+        default=False,
+        editable=False
     )
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, update_fields=None, **kwargs):
+        self.excerpt, self.is_truncated = make_excerpt(self.text)
+        if update_fields is not None and 'text' in update_fields:
+            update_fields = {*update_fields, 'excerpt', 'is_truncated'}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -53,6 +128,22 @@ class Group(models.Model):
         return self.title
 
 
+# Путь комментария — pk всех предков и его собственный, каждый дополнен
+# нулями до одной ширины: сортировка по path даёт обход дерева в глубину.
+PATH_STEP = 10
+PATH_SEPARATOR = '.'
+
+
+class CommentManager(models.Manager):
+    def subtree(self, comment):
+        """Комментарий и все ответы на него — один диапазон по (post, path)."""
+        return self.filter(
+            post_id=comment.post_id,
+            path__gte=comment.path,
+            path__lt=comment.path + chr(ord(PATH_SEPARATOR) + 1),
+        ).order_by('path')
+
+
 class Comment(CreatedModel):
     post = models.ForeignKey(
         Post,
@@ -69,15 +160,60 @@ class Comment(CreatedModel):
     text = models.TextField(
         verbose_name='Текст комментария'
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='replies',
+        verbose_name='Ответ на'
+    )
+    path = models.CharField(
+        'Путь в дереве',
+        max_length=255,
+        blank=True,
+        editable=False
+    )
+    depth = models.PositiveSmallIntegerField(
+        'Глубина',
+        default=0,
+        editable=False
+    )
+
+    objects = CommentManager()
 
     class Meta:
         ordering = ['created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+            models.Index(fields=['post', 'path'],
+                         name='comment_post_path_idx'),
+        ]
 
     def __str__(self):
         return self.text
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        ancestors = []
+        if self.parent is not None:
+            ancestors = self.parent.path.split(PATH_SEPARATOR)
+        if len(ancestors) > settings.COMMENT_MAX_DEPTH:
+            # Глубже нельзя: ответ встаёт рядом с комментарием, на который
+            # отвечают. Новый родитель берётся из пути, без запроса.
+            ancestors.pop()
+            self.parent_id = int(ancestors[-1]) if ancestors else None
+        self.depth = len(ancestors)
+        prefix = ''.join(pk + PATH_SEPARATOR for pk in ancestors)
+        super().save(*args, **kwargs)
+        # pk известен только после вставки.
+        self.path = f'{prefix}{self.pk:0{PATH_STEP}d}'
+        Comment.objects.filter(pk=self.pk).update(path=self.path)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -101,6 +237,200 @@ class Follow(models.Model):
             models.UniqueConstraint(
                 fields=['user', 'author'], name='unique_subscription')
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+            models.Index(fields=['author', '-id'],
+                         name='follow_author_id_idx'),
+            models.Index(fields=['user', '-id'],
+                         name='follow_user_id_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class FollowSuggestion(models.Model):
+    """Кого почитать: строки пересчитывает команда recommend_follows."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name='Читатель'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    score = models.PositiveIntegerField('Вес')
+
+    class Meta:
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_suggestion')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score'],
+                         name='suggestion_user_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.author} ({self.score})'
+
+
+class AuthorStatsManager(models.Manager):
+    def for_user(self, user):
+        """Счётчики пользователя. Если строки нет — пользователя создали
+        в обход сигналов (bulk_create, фикстуры) — посчитать и создать."""
+        try:
+            return user.stats
+        except self.model.DoesNotExist:
+            follows = Follow.objects.filter(
+                models.Q(author=user) | models.Q(user=user)).aggregate(
+                    followers=models.Count(
+                        'pk', filter=models.Q(author=user)),
+                    following=models.Count('pk', filter=models.Q(user=user)))
+            stats = self.model(
+                user=user,
+                posts_count=Post.objects.filter(author=user).count(),
+                followers_count=follows['followers'],
+                following_count=follows['following'],
+            )
+            # Строку мог успеть создать соседний запрос — тогда оставляем её.
+            self.bulk_create([stats], ignore_conflicts=True)
+            user.stats = stats
+            return stats
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    posts_count = models.IntegerField('Количество постов', default=0)
+    followers_count = models.IntegerField('Количество подписчиков', default=0)
+    following_count = models.IntegerField('Количество подписок', default=0)
+
+    objects = AuthorStatsManager()
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'Статистика {self.user}'
+
+
+class PostScore(models.Model):
+    """Рейтинг поста для «Популярного»; ведёт команда update_scores."""
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Пост'
+    )
+    score = models.FloatField('Рейтинг', default=0)
+    comments_seen = models.IntegerField('Учтено комментариев', default=0)
+    views_seen = models.IntegerField('Учтено просмотров', default=0)
+
+    class Meta:
+        verbose_name = 'Рейтинг поста'
+        verbose_name_plural = 'Рейтинги постов'
+        indexes = [
+            models.Index(fields=['score'], name='post_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score:.2f}'
+
+
+class GroupScore(models.Model):
+    """Рейтинг группы — сумма вкладов всех её постов."""
+
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Группа'
+    )
+    score = models.FloatField('Рейтинг', default=0)
+
+    class Meta:
+        verbose_name = 'Рейтинг группы'
+        verbose_name_plural = 'Рейтинги групп'
+        indexes = [
+            models.Index(fields=['score'], name='group_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.group}: {self.score:.2f}'
+
+
+class TimelineManager(models.Manager):
+    def fan_out(self, post):
+        followers = Follow.objects.filter(
+            author_id=post.author_id).values_list('user_id', flat=True)
+        self.bulk_create(
+            (self.model(user_id=user_id, post=post, pub_date=post.pub_date)
+             for user_id in followers.iterator()),
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+    def backfill(self, user_id, author_id):
+        posts = Post.objects.filter(
+            author_id=author_id).values_list('pk', 'pub_date')
+        self.bulk_create(
+            (self.model(user_id=user_id, post_id=pk, pub_date=pub_date)
+             for pk, pub_date in posts.iterator()),
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+    def drop(self, user_id, author_id):
+        self.filter(user_id=user_id, post__author_id=author_id).delete()
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    objects = TimelineManager()
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-id'],
+                         name='timeline_user_pub_date_idx')
+        ]
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user}'
@@ -0,0 +1,227 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+COUNT_KEY = 'feed_count:{}'
+COUNT_TIMEOUT = 60 * 60 * 24
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(Page):
+    """Страница, открытая по курсору: без номера и без COUNT(*)."""
+
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class WindowedPaginator(Paginator):
+    """Paginator, который отдаёт странице только окно номеров вокруг
+    текущего: ``PAGINATOR_WINDOW`` ссылок в каждую сторону."""
+
+    @property
+    def last_numbered_page(self):
+        return self.num_pages
+
+    def page_window(self, number):
+        window = settings.PAGINATOR_WINDOW
+        return range(max(1, number - window),
+                     min(self.last_numbered_page, number + window) + 1)
+
+    def page(self, number):
+        page = super().page(number)
+        page.window = self.page_window(page.number)
+        return page
+
+
+class CursorPaginator(WindowedPaginator):
+    """Paginator с keyset-режимом по полям ``ordering``.
+
+    Первые ``NUMBERED_PAGES_LIMIT`` страниц доступны по ``?page=``,
+    дальше ссылки строятся на непрозрачных курсорах ``?cursor=``,
+    которые фильтруют по ключу сортировки вместо OFFSET. ``rows``
+    превращает выборку в облегчённые строки (см. ``posts.rows``).
+    С ``count_key`` COUNT(*) берётся из кэша: в ключ стоит класть
+    поколение ленты, которое сдвигают создание и удаление постов.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk'),
+                 rows=None, count_key=None, **kwargs):
+        self.ordering = tuple(ordering)
+        self.count_key = count_key
+        # COUNT(*) идёт по исходной выборке: столбцы и join'ы, которые
+        # добавляет rows, для подсчёта не нужны.
+        self.source = object_list = object_list.order_by(*self.ordering)
+        if rows is not None:
+            object_list = rows(object_list)
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return self.source.count()
+        key = COUNT_KEY.format(self.count_key)
+        count = cache.get(key)
+        if count is None:
+            count = self.source.count()
+            cache.set(key, count, COUNT_TIMEOUT)
+        return count
+
+    @property
+    def numbered_pages_limit(self):
+        return settings.NUMBERED_PAGES_LIMIT
+
+    @property
+    def has_cursor_pages(self):
+        return self.num_pages > self.numbered_pages_limit
+
+    @property
+    def last_numbered_page(self):
+        return min(self.num_pages, self.numbered_pages_limit)
+
+    @property
+    def last_cursor(self):
+        return self.encode_cursor(PREVIOUS, None)
+
+    def page(self, number):
+        page = super().page(number)
+        page.next_cursor = None
+        if page.number >= self.numbered_pages_limit and page.has_next():
+            page.next_cursor = self.cursor_after(page[-1])
+        return page
+
+    def get_cursor_page(self, cursor):
+        """Вернуть страницу по курсору; битый курсор ведёт на первую."""
+        try:
+            direction, values = self.decode_cursor(cursor)
+        except InvalidCursor:
+            return self.get_page(1)
+        return self.cursor_page(direction, values)
+
+    def cursor_page(self, direction, values):
+        queryset = self.object_list
+        if direction == PREVIOUS:
+            queryset = queryset.reverse()
+        if values is not None:
+            queryset = queryset.filter(
+                self._keyset_filter(values, direction == PREVIOUS))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == NEXT:
+            return self._cursor_page(rows, has_more, values is not None)
+        rows.reverse()
+        if not has_more and values is not None:
+            return self.cursor_page(NEXT, None)
+        return self._cursor_page(rows, values is not None, has_more)
+
+    def _cursor_page(self, rows, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.cursor_after(rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.cursor_before(rows[0])
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def cursor_after(self, obj):
+        return self.encode_cursor(NEXT, self._key(obj))
+
+    def cursor_before(self, obj):
+        return self.encode_cursor(PREVIOUS, self._key(obj))
+
+    def encode_cursor(self, direction, values):
+        payload = json.dumps([direction, values], default=str)
+        token = base64.urlsafe_b64encode(payload.encode())
+        return token.decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(
+                cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(payload.decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        if direction not in (NEXT, PREVIOUS):
+            raise InvalidCursor(cursor)
+        if values is None:
+            if direction == NEXT:
+                raise InvalidCursor(cursor)
+            return direction, None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor(cursor)
+        try:
+            values = [
+                self._field(name).to_python(value)
+                for name, value in zip(self._names, values)
+            ]
+        except ValidationError:
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    @property
+    def _names(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def _field(self, name):
+        opts = self.object_list.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def _key(self, obj):
+        return [getattr(obj, name) for name in self._names]
+
+    def _keyset_filter(self, values, reverse):
+        condition = Q()
+        equal = {}
+        for ordering, name, value in zip(self.ordering, self._names, values):
+            descending = ordering.startswith('-')
+            lookup = 'gt' if descending == reverse else 'lt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+
+def paginate(request, queryset, **kwargs):
+    paginator = CursorPaginator(queryset, settings.POSTS_COUNT, **kwargs)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        return paginator.get_cursor_page(cursor)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def paginate_comments(post, cursor=None):
+    """Страница комментариев по курсору; без курсора или с битым — первая.
+
+    Комментарии идут в порядке дерева (по path), авторы подтягиваются
+    тем же запросом, COUNT(*) не нужен.
+    """
+    paginator = CursorPaginator(
+        post.comments.select_related('author'), settings.COMMENTS_COUNT,
+        ordering=('path', 'pk'))
+    try:
+        direction, values = paginator.decode_cursor(cursor)
+    except InvalidCursor:
+        direction, values = NEXT, None
+    return paginator.cursor_page(direction, values)
@@ -0,0 +1,115 @@
+from django.db.models.query import ValuesListIterable
+
+from .images import field_file, prefetch_thumbnails
+from .models import Post
+
+COLUMNS = (
+    'id', 'excerpt', 'is_truncated', 'pub_date', 'updated', 'comments_count',
+    'image', 'image_color', 'image_placeholder',
+    'author_id', 'author__username', 'author__first_name',
+    'author__last_name',
+    'group_id', 'group__title', 'group__slug',
+)
+
+
+class AuthorRow:
+    __slots__ = ('id', 'username', 'first_name', 'last_name')
+
+    def __init__(self, id, username, first_name, last_name):
+        self.id = id
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+
+class GroupRow:
+    __slots__ = ('id', 'title', 'slug')
+
+    def __init__(self, id, title, slug):
+        self.id = id
+        self.title = title
+        self.slug = slug
+
+    @property
+    def pk(self):
+        return self.id
+
+
+class PostRow:
+    """Пост для ленты: только то, что рисует карточка, и начало текста."""
+
+    __slots__ = (
+        'id', 'excerpt', 'is_truncated', 'pub_date', 'updated',
+        'comments_count', 'image', 'image_color', 'image_placeholder',
+        'author', 'group',
+    )
+
+    def __init__(self, id, excerpt, is_truncated, pub_date, updated,
+                 comments_count, image, image_color, image_placeholder,
+                 author, group):
+        self.id = id
+        self.excerpt = excerpt
+        self.is_truncated = is_truncated
+        self.pub_date = pub_date
+        self.updated = updated
+        self.comments_count = comments_count
+        self.image = field_file(image)
+        self.image_color = image_color
+        self.image_placeholder = image_placeholder
+        self.author = author
+        self.group = group
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __repr__(self):
+        return f'<PostRow {self.id}>'
+
+
+class PostRowIterable(ValuesListIterable):
+    """Строки values_list превращаются в PostRow; авторы и группы
+    внутри одной выборки не дублируются, миниатюры всей выборки
+    читаются заранее."""
+
+    def __iter__(self):
+        rows = list(self.rows())
+        prefetch_thumbnails(row.image for row in rows)
+        return iter(rows)
+
+    def rows(self):
+        authors = {}
+        groups = {}
+        for row in super().__iter__():
+            *post, author_id, username, first_name, last_name = row[:-3]
+            group_id, title, slug = row[-3:]
+            author = authors.get(author_id)
+            if author is None:
+                author = authors[author_id] = AuthorRow(
+                    author_id, username, first_name, last_name)
+            group = groups.get(group_id)
+            if group is None and group_id is not None:
+                group = groups[group_id] = GroupRow(group_id, title, slug)
+            yield PostRow(*post, author, group)
+
+
+def post_rows(queryset):
+    """Тот же queryset постов, но отдающий PostRow одним запросом
+    с авторами и группами; полный текст из базы не читается."""
+    queryset = queryset.values_list(*COLUMNS)
+    queryset._iterable_class = PostRowIterable
+    return queryset
+
+
+def post_rows_by_ids(ids):
+    # Порядок задаёт ids, сортировка в базе не нужна.
+    posts = Post.objects.filter(pk__in=ids).order_by()
+    rows = {row.pk: row for row in post_rows(posts)}
+    return [rows[pk] for pk in ids if pk in rows]
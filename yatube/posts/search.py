@@ -0,0 +1,144 @@
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+SEARCH_TABLE = 'posts_post_search'
+# Веса bm25 для столбцов text, author, group_title.
+WEIGHTS = (1.0, 0.5, 0.3)
+MARK_START, MARK_END = '\x02', '\x03'
+WORD = re.compile(r'\w+')
+
+AUTHOR = (
+    "(SELECT trim(username || ' ' || first_name || ' ' || last_name) "
+    "FROM auth_user WHERE id = {post}.author_id)"
+)
+GROUP = (
+    "coalesce((SELECT title FROM posts_group WHERE id = {post}.group_id), '')"
+)
+
+
+def index_row(post):
+    return (
+        f'INSERT INTO {SEARCH_TABLE} (rowid, text, author, group_title) '
+        f'VALUES ({post}.id, {post}.text, {AUTHOR.format(post=post)}, '
+        f'{GROUP.format(post=post)});'
+    )
+
+
+# Пересборка таблицы posts_post в миграциях SQLite удаляет её триггеры,
+# поэтому они создаются заново после каждого migrate. Триггеры на auth_user
+# и posts_group ссылаются на posts_post и мешают пересборке: миграции,
+# меняющие Post, снимают их через drop_triggers.
+TRIGGER_NAMES = ('insert', 'update', 'delete', 'author', 'group')
+TRIGGERS = (
+    'CREATE TRIGGER IF NOT EXISTS posts_post_search_insert '
+    f'AFTER INSERT ON posts_post BEGIN {index_row("new")} END',
+    'CREATE TRIGGER IF NOT EXISTS posts_post_search_update '
+    'AFTER UPDATE OF text, author_id, group_id ON posts_post BEGIN '
+    f'DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id; '
+    f'{index_row("new")} END',
+    'CREATE TRIGGER IF NOT EXISTS posts_post_search_delete '
+    'AFTER DELETE ON posts_post BEGIN '
+    f'DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id; END',
+    'CREATE TRIGGER IF NOT EXISTS posts_post_search_author '
+    'AFTER UPDATE OF username, first_name, last_name ON auth_user BEGIN '
+    f'UPDATE {SEARCH_TABLE} SET author = '
+    "trim(new.username || ' ' || new.first_name || ' ' || new.last_name) "
+    'WHERE rowid IN (SELECT id FROM posts_post WHERE author_id = new.id); '
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS posts_post_search_group '
+    'AFTER UPDATE OF title ON posts_group BEGIN '
+    f'UPDATE {SEARCH_TABLE} SET group_title = new.title '
+    'WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id); '
+    'END',
+)
+
+
+def install_triggers(using_connection):
+    if SEARCH_TABLE not in using_connection.introspection.table_names():
+        return
+    with using_connection.cursor() as cursor:
+        for sql in TRIGGERS:
+            cursor.execute(sql)
+
+
+def drop_triggers(using_connection):
+    with using_connection.cursor() as cursor:
+        for name in TRIGGER_NAMES:
+            cursor.execute(f'DROP TRIGGER IF EXISTS posts_post_search_{name}')
+
+
+def match_expression(query):
+    """Превратить ввод пользователя в запрос FTS5: все слова как префиксы.
+
+    Синтаксис FTS5 наружу не выпускается — каждое слово берётся в кавычки.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD.findall(query.lower()))
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class SearchResults:
+    """Результат поиска, который понимает Paginator: count() и срезы.
+
+    Срез выбирает только id, ранг и фрагмент из индекса, а посты
+    догружаются одним запросом.
+    """
+
+    def __init__(self, query):
+        self.match = match_expression(query)
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s', [self.match])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        if not self.match or (index.stop is not None and index.stop <= start):
+            return []
+        limit = -1 if index.stop is None else index.stop - start
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({SEARCH_TABLE}, 0, %s, %s, %s, 24) '
+                f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                f'ORDER BY bm25({SEARCH_TABLE}, %s, %s, %s) '
+                'LIMIT %s OFFSET %s',
+                [MARK_START, MARK_END, '…', self.match, *WEIGHTS,
+                 limit, start])
+            rows = cursor.fetchall()
+        # Вместо текста показывается фрагмент, сам текст не нужен.
+        posts = Post.objects.select_related('author', 'group').defer(
+            'text').in_bulk([pk for pk, _ in rows])
+        found = []
+        for pk, snippet in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.snippet = highlight(snippet)
+                found.append(post)
+        return found
+
+
+def matching_ids_sql(query):
+    """SQL и параметры для ``pk__in``: id постов, подходящих под запрос."""
+    return (f'SELECT rowid FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s', [match_expression(query)])
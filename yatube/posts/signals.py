@@ -0,0 +1,182 @@
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.cache import bump_on_commit
+from . import autocomplete
+from .images import generate_thumbnails, release_image
+from .models import (AuthorStats, Comment, Follow, Group, Post,
+                     TimelineEntry, User)
+from .search import install_triggers
+
+
+def change_stats(user_id, **deltas):
+    AuthorStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()})
+
+
+@receiver(post_save, sender=User)
+def create_stats(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        change_stats(instance.author_id, posts_count=1)
+        TimelineEntry.objects.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def forget_post(sender, instance, **kwargs):
+    change_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def forget_comment(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(
+        comments_count=F('comments_count') - 1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        change_stats(instance.author_id, followers_count=1)
+        change_stats(instance.user_id, following_count=1)
+        TimelineEntry.objects.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_timeline(sender, instance, **kwargs):
+    change_stats(instance.author_id, followers_count=-1)
+    change_stats(instance.user_id, following_count=-1)
+    TimelineEntry.objects.drop(instance.user_id, instance.author_id)
+
+
+def post_namespaces(author_id, *group_ids):
+    namespaces = {'posts', f'author:{author_id}'}
+    namespaces.update(
+        f'group:{group_id}' for group_id in group_ids if group_id)
+    return namespaces
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved(sender, instance, **kwargs):
+    instance._saved_group_id = instance._saved_image = None
+    if instance.pk:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image').first() or (None, None))
+
+
+@receiver(post_save, sender=Post)
+def prepare_thumbnails(sender, instance, **kwargs):
+    image = instance.image
+    saved = getattr(instance, '_saved_image', None)
+    if image and image.name != saved:
+        transaction.on_commit(lambda: generate_thumbnails(image))
+    if saved and saved != image.name:
+        transaction.on_commit(lambda: release_image(saved))
+
+
+@receiver(post_delete, sender=Post)
+def release_post_image(sender, instance, **kwargs):
+    name = instance.image.name
+    if name:
+        transaction.on_commit(lambda: release_image(name))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    bump_on_commit(*post_namespaces(
+        instance.author_id,
+        instance.group_id,
+        getattr(instance, '_saved_group_id', None),
+    ))
+
+
+def count_namespaces(author_id, *group_ids):
+    namespaces = {'counts', f'counts:author:{author_id}'}
+    namespaces.update(
+        f'counts:group:{group_id}' for group_id in group_ids if group_id)
+    return namespaces
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_counts(sender, instance, created, **kwargs):
+    saved_group_id = getattr(instance, '_saved_group_id', None)
+    if created:
+        bump_on_commit(
+            *count_namespaces(instance.author_id, instance.group_id))
+    elif saved_group_id != instance.group_id:
+        bump_on_commit(*(f'counts:group:{group_id}'
+                         for group_id in (saved_group_id, instance.group_id)
+                         if group_id))
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_counts(sender, instance, **kwargs):
+    bump_on_commit(*count_namespaces(instance.author_id, instance.group_id))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    post = Post.objects.filter(
+        pk=instance.post_id).values_list('author_id', 'group_id').first()
+    if post:
+        bump_on_commit(*post_namespaces(*post))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    bump_on_commit('groups', f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, **kwargs):
+    bump_on_commit(
+        f'follow:{instance.user_id}', f'author:{instance.user_id}',
+        f'author:{instance.author_id}', f'followers:{instance.author_id}')
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(['last_login']):
+        return
+    bump_on_commit('posts', 'users', f'author:{instance.pk}')
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    if sender.name == 'posts':
+        install_triggers(connections[using])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def index_username(sender, instance, update_fields=None, **kwargs):
+    if update_fields == frozenset(['last_login']):
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.users.changed(pk))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def index_group(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.groups.changed(pk))
@@ -0,0 +1,34 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.cache import get_version
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def card_key(post, version):
+    return (f'post_card:{post.pk}:{post.updated.timestamp()}:'
+            f'{post.comments_count}:{version}')
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Разметка карточек страницы: один get_many, рендер только промахов."""
+    posts = list(posts)
+    version = get_version('groups', 'users')
+    keys = [card_key(post, version) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in zip(keys, posts)
+        if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,126 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.cache import bump
+
+from .. import autocomplete
+from ..models import Group, Post
+from .utils import capture_on_commit_callbacks
+
+User = get_user_model()
+
+
+class AutocompleteTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for username in ('anna', 'Andrew', 'boris'):
+            User.objects.create_user(username=username)
+        cls.group = Group.objects.create(
+            title='Русская классика', slug='classics', description='-')
+        Group.objects.create(title='Кулинария', slug='food', description='-')
+
+    def setUp(self):
+        cache.clear()
+
+    def usernames(self, prefix):
+        return [
+            item['username']
+            for item in autocomplete.users.search(prefix, limit=10)
+        ]
+
+    def test_users_by_prefix(self):
+        self.assertEqual(self.usernames('AN'), ['Andrew', 'anna'])
+        self.assertEqual(self.usernames('b'), ['boris'])
+        self.assertEqual(self.usernames(' '), [])
+        self.assertEqual(
+            len(autocomplete.users.search('an', limit=1)), 1)
+
+    def test_groups_by_any_word(self):
+        found = autocomplete.groups.search('клас', limit=10)
+        self.assertEqual(
+            found, [{'id': self.group.pk, 'title': 'Русская классика',
+                     'slug': 'classics'}])
+        self.assertEqual(
+            autocomplete.groups.search('русс', limit=10), found)
+
+    def test_signals_update_index(self):
+        self.usernames('a')
+        with capture_on_commit_callbacks(execute=True):
+            user = User.objects.create_user(username='alla')
+        self.assertIn('alla', self.usernames('al'))
+        user.username = 'vera'
+        with capture_on_commit_callbacks(execute=True):
+            user.save()
+        self.assertEqual(self.usernames('al'), [])
+        self.assertEqual(self.usernames('ve'), ['vera'])
+        with capture_on_commit_callbacks(execute=True):
+            user.delete()
+        self.assertEqual(self.usernames('ve'), [])
+
+    def test_index_changes_only_after_commit(self):
+        self.usernames('a')
+        with capture_on_commit_callbacks() as callbacks:
+            User.objects.create_user(username='alla')
+        # Откат транзакции: колбэки не выполнятся, фантома в индексе нет.
+        self.assertEqual(self.usernames('al'), [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.usernames('al'), ['alla'])
+
+    def test_refresh_reads_only_changed_rows(self):
+        self.usernames('a')
+        with capture_on_commit_callbacks(execute=True):
+            User.objects.create_user(username='alla')
+            User.objects.filter(username='boris').update(username='bogdan')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.usernames('al'), ['alla'])
+        self.assertEqual(len(queries), 1)
+        self.assertIn(' IN (', queries[0]['sql'])
+        # boris переименован в обход сигналов — его строку не перечитали.
+        self.assertEqual(self.usernames('bo'), ['boris'])
+
+    def test_other_process_changes_trigger_rebuild(self):
+        self.usernames('a')
+        User.objects.filter(username='boris').update(username='bogdan')
+        self.assertEqual(self.usernames('bo'), ['boris'])
+        bump('autocomplete:users')
+        self.assertEqual(self.usernames('bo'), ['bogdan'])
+
+    def test_local_change_after_other_process_bump_keeps_its_changes(self):
+        self.usernames('a')
+        User.objects.bulk_create([User(username='alex')])
+        bump('autocomplete:users')
+        with capture_on_commit_callbacks(execute=True):
+            User.objects.create_user(username='albert')
+        self.assertEqual(self.usernames('al'), ['albert', 'alex'])
+
+    @override_settings(AUTOCOMPLETE_LIMIT=1)
+    def test_endpoint(self):
+        url = reverse('posts:autocomplete', args=['users'])
+        Client().get(url, {'q': 'an'})
+        with self.assertNumQueries(0):
+            response = Client().get(url, {'q': 'an'})
+        self.assertEqual(response.json(), {'results': [{
+            'username': 'Andrew',
+            'url': reverse('posts:profile', args=['Andrew']),
+        }]})
+        response = Client().get(
+            reverse('posts:autocomplete', args=['posts']), {'q': 'a'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_group_select_renders_only_selected_option(self):
+        author = User.objects.get(username='anna')
+        post = Post.objects.create(
+            author=author, text='Текст', group=self.group)
+        client = Client()
+        client.force_login(author)
+        response = client.get(reverse('posts:post_edit', args=[post.pk]))
+        self.assertContains(response, '<option', count=2)
+        self.assertContains(response, 'Русская классика')
+        self.assertNotContains(response, 'Кулинария')
+        self.assertContains(response, 'js/autocomplete.js')
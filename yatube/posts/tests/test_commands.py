@@ -0,0 +1,200 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+
+from ..images import generate_thumbnails
+from ..models import AuthorStats, Comment, Follow, Group, Post
+from .test_images import SMALL_GIF
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+class RecountStatsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Текст')
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Да')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_recount_repairs_drift(self):
+        AuthorStats.objects.update(
+            posts_count=10, followers_count=10, following_count=10)
+        AuthorStats.objects.filter(user=self.reader).delete()
+        Post.objects.update(comments_count=0)
+        call_command('recount_stats', chunk_size=1, stdout=StringIO())
+        author_stats = AuthorStats.objects.get(user=self.author)
+        reader_stats = AuthorStats.objects.get(user=self.reader)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(author_stats.following_count, 0)
+        self.assertEqual(reader_stats.following_count, 1)
+        self.assertEqual(Post.objects.get().comments_count, 1)
+
+
+class CheckQueryPlansCommandTest(TestCase):
+    def test_feed_plans_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', seed=50, stdout=out)
+        self.assertIn('Все планы используют индексы', out.getvalue())
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RebuildThumbnailsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=author, text='Текст', group=group,
+                image=SimpleUploadedFile(
+                    f'small_{number}.gif', SMALL_GIF, 'image/gif'))
+            for number, group in enumerate((cls.group, None, None))
+        ]
+        cls.checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'checkpoint')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def rebuild(self, **options):
+        out = StringIO()
+        with mock.patch(
+                'posts.management.commands.rebuild_thumbnails'
+                '.generate_thumbnails',
+                side_effect=generate_thumbnails) as generate:
+            call_command('rebuild_thumbnails', workers=1,
+                         checkpoint=self.checkpoint, stdout=out, **options)
+        return [image.name for (image,), _ in generate.call_args_list], out
+
+    def test_rebuild_all(self):
+        names, out = self.rebuild()
+        self.assertEqual(names, [post.image.name for post in self.posts])
+        self.assertIn('Обработано: 3, с ошибками: 0', out.getvalue())
+        self.assertFalse(os.path.exists(self.checkpoint))
+        self.assertFalse(
+            Post.objects.filter(image_width__isnull=True).exists())
+
+    def test_rebuild_resumes_from_checkpoint(self):
+        with open(self.checkpoint, 'w') as log:
+            log.write(f'{self.posts[0].pk}\n{self.posts[1].pk}\n')
+        names, out = self.rebuild()
+        self.assertEqual(names, [self.posts[2].image.name])
+        self.assertIn('уже готово 2', out.getvalue())
+
+    def test_failed_image_does_not_stop_rebuild(self):
+        # У постов одна и та же картинка: ломаем второй по счёту вызов.
+        calls = []
+
+        def generate(image):
+            calls.append(image)
+            if len(calls) == 2:
+                raise OperationalError('database is locked')
+            return generate_thumbnails(image)
+
+        self.addCleanup(os.remove, self.checkpoint)
+
+        out = StringIO()
+        with mock.patch(
+                'posts.management.commands.rebuild_thumbnails'
+                '.generate_thumbnails', side_effect=generate), \
+                self.assertLogs(
+                    'posts.management.commands.rebuild_thumbnails', 'ERROR'):
+            call_command('rebuild_thumbnails', workers=1,
+                         checkpoint=self.checkpoint, stdout=out)
+        self.assertIn('Обработано: 3, с ошибками: 1', out.getvalue())
+        with open(self.checkpoint) as log:
+            self.assertEqual(
+                log.read().split(),
+                [str(self.posts[0].pk), str(self.posts[2].pk)])
+
+    def test_rebuild_group(self):
+        names, _ = self.rebuild(group=self.group.slug)
+        self.assertEqual(names, [self.posts[0].image.name])
+
+
+class BenchUploadCommandTest(TestCase):
+    def test_reports_peak_rss_for_jpeg_and_png(self):
+        out = StringIO()
+        call_command('bench_upload', megapixels=0.1, png_megapixels=0.1,
+                     runs=1, stdout=out)
+        self.assertEqual(out.getvalue().count('пик RSS'), 4)
+        self.assertIn('PNG', out.getvalue())
+        self.assertNotIn('отклонена', out.getvalue())
+
+
+class BenchFeedsCommandTest(TestCase):
+    def test_compares_models_and_rows(self):
+        out = StringIO()
+        call_command('bench_feeds', posts=20, runs=1, stdout=out)
+        self.assertEqual(out.getvalue().count('КБ, загрузка'), 2)
+        self.assertFalse(Post.objects.exists())
+
+
+class BenchGroupFeedCommandTest(TestCase):
+    def test_reports_every_size(self):
+        out = StringIO()
+        call_command('bench_group_feed', sizes=[5, 30], runs=1, stdout=out)
+        self.assertIn('5 постов: первая с холодным кэшем', out.getvalue())
+        self.assertIn('30 постов:', out.getvalue())
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DedupeImagesCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, 'posts'),
+                      ignore_errors=True)
+        author = User.objects.create_user(username='author')
+        self.posts = []
+        for name in ('posts/first.gif', 'posts/old/second.gif'):
+            default_storage.save(name, ContentFile(SMALL_GIF))
+            self.posts.append(
+                Post.objects.create(author=author, text='Текст', image=name))
+
+    def dedupe(self, **options):
+        out = StringIO()
+        call_command('dedupe_images', stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_changes_nothing(self):
+        self.assertIn('дубликатов: 1', self.dedupe(dry_run=True))
+        self.assertTrue(default_storage.exists('posts/first.gif'))
+        self.assertTrue(
+            Post.objects.filter(image='posts/old/second.gif').exists())
+
+    def test_duplicates_merged(self):
+        self.assertIn('перенесено: 2, дубликатов: 1', self.dedupe())
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertRegex(name, r'^posts/\w{2}/\w{64}\.gif$')
+        self.assertTrue(default_storage.exists(name))
+        self.assertFalse(default_storage.exists('posts/first.gif'))
+        self.assertFalse(default_storage.exists('posts/old/second.gif'))
+        self.assertIn('перенесено: 0', self.dedupe())
@@ -0,0 +1,98 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError
+from django.db.models import QuerySet
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..counters import ViewCounter, post_views
+from ..models import Post, PostScore
+from ..trending import update_scores
+
+User = get_user_model()
+
+
+class ViewCounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.other = Post.objects.create(author=cls.author, text='Другой')
+
+    def setUp(self):
+        cache.clear()
+        post_views.clear()
+        self.url = reverse('posts:post_detail', args=[self.post.pk])
+
+    def views(self, post):
+        return Post.objects.get(pk=post.pk).views_count
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=0)
+    def test_zero_interval_writes_every_view(self):
+        Client().get(self.url)
+        response = Client().get(self.url)
+        self.assertEqual(self.views(self.post), 2)
+        # Просмотр записывается после ответа и виден со следующего.
+        self.assertContains(response, 'Просмотров:<span >1</span>')
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=3600)
+    def test_views_are_buffered_and_flushed_in_one_update(self):
+        for url in (self.url, self.url,
+                    reverse('posts:post_detail', args=[self.other.pk])):
+            Client().get(url)
+        self.assertEqual(self.views(self.post), 0)
+        with self.assertNumQueries(1):
+            self.assertEqual(post_views.flush(), 2)
+        self.assertEqual(self.views(self.post), 2)
+        self.assertEqual(self.views(self.other), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(post_views.flush(), 0)
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=3600)
+    def test_not_modified_response_is_counted(self):
+        client = Client()
+        etag = client.get(self.url)['ETag']
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        post_views.flush()
+        self.assertEqual(self.views(self.post), 2)
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=0)
+    def test_failed_flush_keeps_views_and_page(self):
+        error = OperationalError('database is locked')
+        with mock.patch.object(QuerySet, 'update', side_effect=error):
+            with self.assertLogs('posts.counters', 'ERROR'):
+                response = Client().get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.views(self.post), 0)
+        Client().get(self.url)
+        self.assertEqual(self.views(self.post), 2)
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=3600)
+    def test_missing_post_is_not_counted(self):
+        missing = reverse('posts:post_detail', args=[self.other.pk + 100])
+        self.assertEqual(Client().get(missing).status_code, 404)
+        self.assertEqual(post_views.pending, {})
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=3600,
+                       VIEW_COUNTS_FLUSH_THREAD=True)
+    def test_flush_thread_starts_once_per_process(self):
+        counter = ViewCounter()
+        with mock.patch('threading.Thread') as thread, \
+                mock.patch('atexit.register') as register:
+            counter.record(self.post.pk)
+            counter.record(self.post.pk)
+        thread.return_value.start.assert_called_once_with()
+        register.assert_called_once_with(counter.flush)
+
+    def test_views_raise_trending_score(self):
+        update_scores()
+        before = PostScore.objects.get(post=self.post).score
+        Post.objects.filter(pk=self.post.pk).update(views_count=50)
+        self.assertEqual(update_scores(), 1)
+        score = PostScore.objects.get(post=self.post)
+        self.assertGreater(score.score, before)
+        self.assertEqual(score.views_seen, 50)
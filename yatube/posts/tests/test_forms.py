@@ -88,7 +88,8 @@ class PostCreateFormTests(TestCase):
             Post.objects.filter(
                 text=form_data.get('text'),
                 group=self.group.id,
-                image='posts/small.gif'
+                image__startswith='posts/',
+                image__endswith='.gif',
             ).exists()
         )
         post = Post.objects.first()
@@ -96,7 +97,27 @@ class PostCreateFormTests(TestCase):
             text=form_data.get('text')).text, form_data.get('text'))
         self.assertEqual(post.author, self.user)
         self.assertEqual(post.group, self.group)
-        self.assertIn(self.uploaded.name, post.image.name)
+        self.assertRegex(post.image.name, r'^posts/\w{2}/\w{64}\.gif$')
+
+    def test_create_post_stores_image_details(self):
+        uploaded = SimpleUploadedFile(
+            name='details.gif',
+            content=self.small_gif,
+            content_type='image/gif',
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Картинка с размерами', 'image': uploaded},
+        )
+        post = Post.objects.get(text='Картинка с размерами')
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertRegex(post.image_color, r'^#[0-9a-f]{6}$')
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,'))
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, post.image_placeholder)
 
     def test_edit_post(self):
         form_data = {
@@ -0,0 +1,149 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import graph
+from ..models import Follow, FollowSuggestion
+
+User = get_user_model()
+
+
+class GraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fans = [
+            User.objects.create_user(username=f'fan_{number}')
+            for number in range(5)
+        ]
+        for fan in cls.fans:
+            Follow.objects.create(user=fan, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.fans[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_is_following_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(graph.is_following(self.reader, self.fans[0]))
+        with self.assertNumQueries(0):
+            self.assertFalse(graph.is_following(self.reader, self.reader))
+        self.assertFalse(graph.is_following(self.reader, self.author))
+
+    def test_followed_ids_for_whole_page(self):
+        ids = [self.author.pk] + [fan.pk for fan in self.fans]
+        with self.assertNumQueries(1):
+            followed = graph.followed_ids(self.reader, ids)
+        self.assertEqual(followed, {self.fans[0].pk})
+
+    @override_settings(POSTS_COUNT=2)
+    def test_followers_list_is_paginated(self):
+        url = reverse('posts:followers', args=[self.author.username])
+        response = self.client.get(url)
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 5)
+        self.assertEqual(list(page_obj), [self.fans[4], self.fans[3]])
+        response = self.client.get(url, {'page': 3})
+        self.assertEqual(list(response.context['page_obj']), [self.fans[0]])
+        self.assertContains(
+            response,
+            reverse('posts:profile_unfollow', args=[self.fans[0].username]))
+
+    def test_following_list(self):
+        response = self.client.get(
+            reverse('posts:following', args=[self.fans[0].username]))
+        self.assertEqual(list(response.context['page_obj']), [self.author])
+        self.assertContains(
+            response,
+            reverse('posts:profile_follow', args=[self.author.username]))
+
+
+class RecommendFollowsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ('reader', 'friend', 'writer', 'poet', 'twin', 'cook', 'fan')
+        cls.users = {
+            name: User.objects.create_user(username=name) for name in names}
+        for user, author in (
+            ('reader', 'friend'),
+            ('friend', 'writer'),
+            ('friend', 'poet'),
+            ('twin', 'friend'),
+            ('twin', 'cook'),
+            ('fan', 'reader'),
+            ('fan', 'writer'),
+        ):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author])
+
+    def setUp(self):
+        cache.clear()
+        call_command('recommend_follows', stdout=StringIO())
+        self.reader = self.users['reader']
+
+    def test_scores_friends_of_friends_and_cofollows(self):
+        # writer и poet читает friend, cook — twin, который тоже читает
+        # friend. Подписки fan, читателя reader, в счёт не идут.
+        self.assertEqual(
+            dict(self.reader.suggestions.values_list(
+                'author__username', 'score')),
+            {'writer': 2, 'poet': 2, 'cook': 1})
+        self.assertFalse(
+            FollowSuggestion.objects.filter(author=self.users['friend'],
+                                            user=self.reader).exists())
+
+    def test_graph_in_memory(self):
+        followed = graph.FollowGraph(chunk_size=2)
+        self.assertEqual(followed.edges, 7)
+        self.assertEqual(
+            list(followed.followers.neighbours(self.users['writer'].pk)),
+            [self.users['friend'].pk, self.users['fan'].pk])
+
+    def test_suggestions_read_in_one_query(self):
+        with self.assertNumQueries(1):
+            suggestions = graph.suggestions(self.reader)
+            self.assertEqual(
+                [suggestion.author.username for suggestion in suggestions],
+                ['writer', 'poet', 'cook'])
+        Follow.objects.create(user=self.reader, author=self.users['poet'])
+        self.assertEqual(
+            [suggestion.author for suggestion in graph.suggestions(
+                self.reader, limit=1)],
+            [self.users['writer']])
+
+    def test_follow_and_own_profile_show_suggestions(self):
+        client = Client()
+        client.force_login(self.reader)
+        follow_url = reverse('posts:profile_follow', args=['writer'])
+        response = client.get(reverse('posts:follow_index'))
+        self.assertContains(response, follow_url)
+        response = client.get(reverse('posts:profile', args=['reader']))
+        self.assertContains(response, follow_url)
+        response = client.get(reverse('posts:profile', args=['fan']))
+        self.assertNotContains(response, 'Кого почитать')
+
+    def test_rerun_replaces_stale_rows(self):
+        Follow.objects.filter(user=self.users['twin']).delete()
+        out = StringIO()
+        call_command('recommend_follows', stdout=out)
+        self.assertIn('Подписок: 5', out.getvalue())
+        self.assertEqual(
+            list(self.reader.suggestions.values_list(
+                'author__username', flat=True).order_by('author__username')),
+            ['poet', 'writer'])
+
+    def test_bench_edges_are_rolled_back(self):
+        out = StringIO()
+        call_command('recommend_follows', bench_edges=200, stdout=out)
+        self.assertIn('матрицы', out.getvalue())
+        self.assertEqual(Follow.objects.count(), 7)
+        self.assertEqual(User.objects.count(), len(self.users))
@@ -0,0 +1,153 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+
+from ..forms import PostForm
+from ..images import release_image
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+
+    def test_thumbnails_are_built_on_upload(self):
+        post = Post.objects.create(
+            author=self.user, text='Текст',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'))
+        with mock.patch.object(default.engine, 'get_image') as get_image:
+            for geometry, options in settings.POST_THUMBNAILS:
+                get_thumbnail(post.image, geometry, **options)
+        get_image.assert_not_called()
+
+    def test_identical_uploads_share_one_file(self):
+        first, second = (
+            Post.objects.create(
+                author=self.user, text='Текст',
+                image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'))
+            for name in ('first.gif', 'second.gif')
+        )
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^posts/\w{2}/\w{64}\.gif$')
+        storage = first.image.storage
+        first.delete()
+        self.assertTrue(storage.exists(second.image.name))
+        second.delete()
+        self.assertFalse(storage.exists(second.image.name))
+
+    def test_upload_restores_file_released_before_commit(self):
+        first = Post.objects.create(
+            author=self.user, text='Текст',
+            image=SimpleUploadedFile('first.gif', SMALL_GIF, 'image/gif'))
+        storage = first.image.storage
+        with transaction.atomic():
+            second = Post.objects.create(
+                author=self.user, text='Текст',
+                image=SimpleUploadedFile('second.gif', SMALL_GIF, 'image/gif'))
+            # Соседний запрос снял последнюю ссылку и удалил файл.
+            first.delete()
+            storage.delete(first.image.name)
+        self.assertTrue(storage.exists(second.image.name))
+
+    def test_release_keeps_file_referenced_during_check(self):
+        post = Post.objects.create(
+            author=self.user, text='Текст',
+            image=SimpleUploadedFile('first.gif', SMALL_GIF, 'image/gif'))
+        name = post.image.name
+        Post.objects.filter(pk=post.pk).update(image='')
+        rename = os.rename
+
+        def rename_and_reference(source, target):
+            rename(source, target)
+            # Ссылка закоммичена между двумя проверками.
+            Post.objects.create(author=self.user, text='Текст', image=name)
+
+        with mock.patch('posts.images.os.rename', rename_and_reference):
+            self.assertFalse(release_image(name))
+        self.assertTrue(post.image.storage.exists(name))
+
+    def test_missing_file_is_skipped(self):
+        post = Post.objects.create(
+            author=self.user, text='Текст', image='posts/missing.gif')
+        self.assertEqual(post.image.name, 'posts/missing.gif')
+
+
+def make_upload(name, image_format, size, **save_options):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(
+        buffer, image_format, **save_options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(POST_IMAGE_MAX_SIZE=(40, 40))
+class UploadPipelineTest(TestCase):
+    def clean(self, upload):
+        form = PostForm(data={'text': 'Текст'}, files={'image': upload})
+        form.is_valid()
+        return form
+
+    def test_large_image_is_downscaled_without_metadata(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        form = self.clean(make_upload(
+            'photo.jpg', 'JPEG', (400, 200), exif=exif.tobytes()))
+        self.assertTrue(form.is_valid(), form.errors)
+        image = form.cleaned_data['image']
+        self.assertTrue(hasattr(image, 'temporary_file_path'))
+        with Image.open(image) as result:
+            self.assertEqual(result.format, 'JPEG')
+            self.assertEqual(result.size, (40, 20))
+            self.assertFalse(result.getexif())
+
+    def test_unknown_format_becomes_png(self):
+        form = self.clean(make_upload('picture.bmp', 'BMP', (10, 10)))
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['image'].name, 'picture.png')
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected_by_header(self):
+        with mock.patch('posts.forms.reencode_upload') as reencode:
+            form = self.clean(make_upload('big.png', 'PNG', (20, 20)))
+        self.assertIn('Слишком большая картинка', form.errors['image'][0])
+        reencode.assert_not_called()
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000,
+                       POST_IMAGE_MAX_PIXELS_FULL_DECODE=100)
+    def test_formats_without_draft_have_lower_limit(self):
+        form = self.clean(make_upload('big.jpg', 'JPEG', (20, 20)))
+        self.assertTrue(form.is_valid(), form.errors)
+        for name, image_format in (('big.png', 'PNG'), ('big.webp', 'WEBP'),
+                                   ('big.gif', 'GIF')):
+            with self.subTest(image_format=image_format):
+                form = self.clean(make_upload(name, image_format, (20, 20)))
+                self.assertIn(
+                    'Слишком большая картинка', form.errors['image'][0])
@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
 
-from ..models import Group, Post
+from ..models import AuthorStats, Comment, Follow, Group, Post
 
 
 User = get_user_model()
@@ -31,3 +32,110 @@ class PostModelTest(TestCase):
         group = PostModelTest.group
         excepted_object_name = group.title
         self.assertEqual(excepted_object_name, group.title)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_counters_follow_writes(self):
+        post = Post.objects.create(author=self.author, text='Текст')
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.author.stats.refresh_from_db()
+        self.reader.stats.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+        follow.delete()
+        post.delete()
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 0)
+        self.assertEqual(self.author.stats.followers_count, 0)
+
+    def test_users_without_stats_row_get_one(self):
+        ghost, = User.objects.bulk_create([User(username='ghost')])
+        ghost = User.objects.get(username='ghost')
+        post = Post.objects.create(author=ghost, text='Текст')
+        Follow.objects.create(user=self.reader, author=ghost)
+        AuthorStats.objects.filter(user=ghost).delete()
+        for url in (reverse('posts:profile', args=['ghost']),
+                    reverse('posts:post_detail', args=[post.pk])):
+            AuthorStats.objects.filter(user=ghost).delete()
+            response = Client().get(url)
+            self.assertEqual(response.status_code, 200)
+        stats = AuthorStats.objects.get(user=ghost)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+
+
+@override_settings(COMMENT_MAX_DEPTH=2)
+class CommentTreeTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='Текст')
+
+    def comment(self, text, parent=None):
+        return Comment.objects.create(
+            post=self.post, author=self.user, text=text, parent=parent)
+
+    def texts(self, comments):
+        return [(comment.text, comment.depth) for comment in comments]
+
+    def test_tree_order_and_depth_limit(self):
+        first = self.comment('1')
+        second = self.comment('2')
+        reply = self.comment('1.1', first)
+        self.comment('2.1', second)
+        deep = self.comment('1.1.1', reply)
+        too_deep = self.comment('1.1.2', deep)
+        self.assertEqual(too_deep.parent_id, reply.pk)
+        self.assertEqual(
+            self.texts(self.post.comments.order_by('path')),
+            [('1', 0), ('1.1', 1), ('1.1.1', 2), ('1.1.2', 2),
+             ('2', 0), ('2.1', 1)])
+
+    def test_subtree_is_one_range_query(self):
+        first = self.comment('1')
+        reply = self.comment('1.1', first)
+        self.comment('1.1.1', reply)
+        self.comment('2')
+        with self.assertNumQueries(1):
+            subtree = list(Comment.objects.subtree(reply))
+        self.assertEqual(self.texts(subtree), [('1.1', 1), ('1.1.1', 2)])
+        self.assertEqual(
+            len(Comment.objects.subtree(first).select_related('author')), 3)
+
+    def test_reply_through_form(self):
+        first = self.comment('1')
+        client = Client()
+        client.force_login(self.user)
+        client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Ответ', 'parent': first.pk})
+        client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Без родителя', 'parent': 'x'})
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual((reply.parent, reply.depth), (first, 1))
+        self.assertIsNone(Comment.objects.get(text='Без родителя').parent)
+        response = client.get(
+            reverse('posts:comments', args=[self.post.pk]),
+            {'thread': first.pk})
+        self.assertEqual(
+            self.texts(response.context['comments']), [('1', 0), ('Ответ', 1)])
+        self.assertContains(response, f'data-comment-reply="{reply.pk}"')
+
+    def test_thread_must_be_a_number(self):
+        url = reverse('posts:comments', args=[self.post.pk])
+        for thread in ('abc', '-1', '1.5'):
+            with self.subTest(thread=thread):
+                response = Client().get(url, {'thread': thread})
+                self.assertEqual(response.status_code, 404)
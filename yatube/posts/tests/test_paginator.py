@@ -1,8 +1,12 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Group, Post
+from ..models import Comment, Group, Post
+from .utils import capture_on_commit_callbacks
 
 User = get_user_model()
 
@@ -51,7 +55,7 @@ class PaginatorViewsTest(TestCase):
         response = self.authorized_client.get(reverse(
             'posts:group_list', kwargs={'slug': self.group.slug}) + '?page=2'
         )
-        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertEqual(len(response.context['page_obj']), 3)
 
     def test_first_profile_page_contains_ten_records(self):
         response = self.authorized_client.get(reverse(
@@ -66,3 +70,145 @@ class PaginatorViewsTest(TestCase):
             }) + '?page=2'
         )
         self.assertEqual(len(response.context['page_obj']), 3)
+
+    @override_settings(NUMBERED_PAGES_LIMIT=1)
+    def test_cursor_pages(self):
+        first_page = self.authorized_client.get(
+            reverse('posts:index')).context['page_obj']
+        self.assertIsNotNone(first_page.next_cursor)
+        response = self.authorized_client.get(
+            reverse('posts:index') + f'?cursor={first_page.next_cursor}')
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            second_page[0].pk, first_page[len(first_page) - 1].pk - 1)
+        response = self.authorized_client.get(
+            reverse('posts:index') + f'?cursor={second_page.previous_cursor}')
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [post.pk for post in first_page]
+        )
+
+    @override_settings(NUMBERED_PAGES_LIMIT=1)
+    def test_last_cursor_page(self):
+        first_page = self.authorized_client.get(
+            reverse('posts:index')).context['page_obj']
+        response = self.authorized_client.get(
+            reverse('posts:index')
+            + f'?cursor={first_page.paginator.last_cursor}'
+        )
+        last_page = response.context['page_obj']
+        self.assertEqual(len(last_page), 10)
+        self.assertEqual(
+            last_page[len(last_page) - 1].pk,
+            Post.objects.order_by('pk')[0].pk)
+        self.assertTrue(last_page.has_previous())
+        self.assertFalse(last_page.has_next())
+
+    def test_broken_cursor_opens_first_page(self):
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?cursor=broken'
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+    @override_settings(NUMBERED_PAGES_LIMIT=100, PAGINATOR_WINDOW=1,
+                       POSTS_COUNT=1)
+    def test_only_window_of_pages_is_rendered(self):
+        response = self.guest_client.get(reverse('posts:index'), {'page': 5})
+        self.assertEqual(response.context['page_obj'].window, range(4, 7))
+        for number in (4, 5, 6):
+            self.assertContains(response, f'>{number}<')
+        self.assertNotContains(response, 'page=3"')
+        self.assertNotContains(response, 'page=7"')
+        self.assertContains(response, '…', count=2)
+
+    def test_feed_counts_are_cached_until_posts_change(self):
+        cache.clear()
+        url = reverse('posts:group_list', args=[self.group.slug])
+        self.guest_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url, {'page': 2})
+        self.assertFalse(
+            [query for query in queries if 'COUNT(' in query['sql']])
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+        self.guest_client.get(reverse('posts:index'))
+        post = Post.objects.filter(group=self.group).first()
+        with capture_on_commit_callbacks(execute=True):
+            Comment.objects.create(post=post, author=self.user, text='Ответ')
+            post.text = 'Правка'
+            post.save()
+        for path in (url, reverse('posts:index')):
+            with CaptureQueriesContext(connection) as queries:
+                self.guest_client.get(path, {'page': 2})
+            self.assertFalse(
+                [query for query in queries if 'COUNT(' in query['sql']])
+        with capture_on_commit_callbacks(execute=True):
+            Post.objects.create(
+                author=self.user, text='Ещё', group=self.group)
+        response = self.guest_client.get(url, {'page': 2})
+        self.assertEqual(response.context['page_obj'].paginator.count, 14)
+        post.group = None
+        with capture_on_commit_callbacks(execute=True):
+            post.save()
+        response = self.guest_client.get(url, {'page': 2})
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+
+
+@override_settings(COMMENTS_COUNT=3)
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='Текст')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'user_{number}'),
+                text=f'Комментарий {number}',
+            )
+            for number in range(7)
+        ]
+
+    def pks(self, page):
+        return [comment.pk for comment in page]
+
+    def test_post_detail_renders_first_page(self):
+        response = Client().get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        comments = response.context['comments']
+        self.assertEqual(
+            self.pks(comments), [c.pk for c in self.comments[:3]])
+        self.assertContains(
+            response,
+            reverse('posts:comments', args=[self.post.pk])
+            + f'?cursor={comments.next_cursor}'
+        )
+
+    def test_fragment_pages_follow_cursor(self):
+        url = reverse('posts:comments', args=[self.post.pk])
+        cursor = Client().get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).context['comments'].next_cursor
+        seen = []
+        while cursor:
+            with self.assertNumQueries(2):
+                response = Client().get(url, {'cursor': cursor})
+            self.assertTemplateUsed(
+                response, 'posts/includes/comment_list.html')
+            comments = response.context['comments']
+            seen += self.pks(comments)
+            cursor = comments.next_cursor
+        self.assertEqual(seen, [c.pk for c in self.comments[3:]])
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_fragment_without_cursor_and_unknown_post(self):
+        url = reverse('posts:comments', args=[self.post.pk])
+        response = Client().get(url, {'cursor': 'broken'})
+        self.assertEqual(
+            self.pks(response.context['comments']),
+            [c.pk for c in self.comments[:3]])
+        response = Client().get(
+            reverse('posts:comments', args=[self.post.pk + 100]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,177 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from core.queries import QueryBudgetExceeded, query_budget
+
+from ..models import EXCERPT_LENGTH, Comment, Follow, Group, Post
+from ..rows import post_rows
+from .utils import capture_on_commit_callbacks
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+@query_budget(2)
+def users_view(request):
+    for user in User.objects.all():
+        User.objects.filter(pk=user.pk).exists()
+    return HttpResponse()
+
+
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        for number in range(5):
+            User.objects.create_user(username=f'user_{number}')
+        self.request = RequestFactory().get('/')
+
+    def test_budget_raises_in_tests(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'N+1'):
+            users_view(self.request)
+
+    @override_settings(QUERY_BUDGET_RAISE=False)
+    def test_budget_logs_when_not_raising(self):
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            response = users_view(self.request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('6 запросов при бюджете 2', logs.output[0])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class FeedQueriesTest(TestCase):
+    """Число запросов лент не зависит от числа постов на странице —
+    и с картинками, чьи миниатюры читаются из хранилища sorl."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # В кэше sorl не должно остаться миниатюр прошлого теста.
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def image(self):
+        # Разные картинки: у одинаковых один файл и одни ключи sorl.
+        buffer = BytesIO()
+        Image.new('RGB', (8, 8), (Post.objects.count(), 0, 0)).save(
+            buffer, 'PNG')
+        return SimpleUploadedFile('image.png', buffer.getvalue())
+
+    def add_post(self, **fields):
+        # Миниатюры строятся после коммита, как при загрузке через форму.
+        with capture_on_commit_callbacks(execute=True):
+            return Post.objects.create(
+                text='Текст', image=self.image(), **fields)
+
+    def add_posts(self, count):
+        for number in range(count):
+            author = User.objects.create_user(
+                username=f'author_{Post.objects.count()}')
+            group = Group.objects.create(
+                title='Группа', slug=f'group-{Post.objects.count()}',
+                description='Описание')
+            self.add_post(author=author, group=group)
+            post = self.add_post(author=self.author, group=self.group)
+            Comment.objects.create(post=post, author=author, text='Да')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_feeds_query_count_is_constant(self):
+        post = self.add_post(author=self.author)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+            reverse('posts:follow_index'),
+        )
+        self.add_posts(1)
+        few = {url: self.count_queries(url) for url in urls}
+        self.add_posts(9)
+        for number in range(5):
+            Comment.objects.create(post=post, author=self.reader, text='Да')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), few[url])
+
+    def test_missing_thumbnails_are_built_once(self):
+        with capture_on_commit_callbacks():
+            for number in range(3):
+                Post.objects.create(
+                    author=self.author, text='Текст', image=self.image())
+        url = reverse('posts:index')
+        self.client.get(url)
+        with mock.patch.object(default.engine, 'get_image') as get_image:
+            self.count_queries(url)
+        get_image.assert_not_called()
+
+
+class PostRowsTest(TestCase):
+    def test_rows_load_in_one_query(self):
+        author = User.objects.create_user(username='author')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        long_post = Post.objects.create(
+            author=author, group=group, text='слово ' * EXCERPT_LENGTH)
+        Post.objects.create(author=author, text='Короткий')
+        with self.assertNumQueries(1):
+            long, short = post_rows(Post.objects.order_by('pk'))[:2]
+        self.assertEqual(short.excerpt, 'Короткий')
+        self.assertFalse(short.is_truncated)
+        self.assertIsNone(short.group)
+        self.assertTrue(long.is_truncated)
+        self.assertLessEqual(len(long.excerpt), EXCERPT_LENGTH)
+        self.assertTrue(long_post.text.startswith(long.excerpt[:-1]))
+        self.assertIs(short.author, long.author)
+        self.assertEqual(long.group.slug, 'group')
+
+
+class CachedGroupTest(TestCase):
+    def test_group_read_through_cache(self):
+        cache.clear()
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        url = reverse('posts:group_list', args=[group.slug])
+        Client().get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(Client().get(url).status_code, 200)
+        self.assertFalse(
+            [query for query in queries if 'posts_group' in query['sql']])
+        group.title = 'Новое название'
+        with capture_on_commit_callbacks(execute=True):
+            group.save()
+        self.assertContains(Client().get(url), 'Новое название')
+        group.slug = 'renamed'
+        with capture_on_commit_callbacks(execute=True):
+            group.save()
+        self.assertEqual(Client().get(url).status_code, 404)
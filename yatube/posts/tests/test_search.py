@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..search import SearchResults
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Классика', slug='classics', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Все счастливые семьи похожи друг на друга')
+        cls.other = Post.objects.create(
+            author=User.objects.create_user(username='other'),
+            text='Рецепт <b>семейного</b> пирога')
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query):
+        return [post.pk for post in SearchResults(query)[:10]]
+
+    def test_prefix_match_over_text_author_and_group(self):
+        self.assertEqual(self.found('счастл'), [self.post.pk])
+        self.assertEqual(self.found('толстой'), [self.post.pk])
+        self.assertEqual(self.found('КЛАССИКА'), [self.post.pk])
+        self.assertEqual(self.found('семьи похожи'), [self.post.pk])
+        self.assertEqual(self.found('"; DROP'), [])
+        self.assertEqual(self.found(''), [])
+
+    def test_text_match_ranks_first(self):
+        Post.objects.create(
+            author=User.objects.create_user(
+                username='pirog', first_name='Пирог'),
+            text='Без совпадений в тексте')
+        found = self.found('пирог')
+        self.assertEqual(found[0], self.other.pk)
+        self.assertEqual(len(found), 2)
+
+    def test_index_follows_writes(self):
+        Post.objects.filter(pk=self.post.pk).update(text='Анна Каренина')
+        self.assertEqual(self.found('счастливые'), [])
+        self.assertEqual(self.found('каренина'), [self.post.pk])
+        Group.objects.filter(pk=self.group.pk).update(title='Романы')
+        self.assertEqual(self.found('романы'), [self.post.pk])
+        User.objects.filter(pk=self.author.pk).update(last_name='Николаевич')
+        self.assertEqual(self.found('николаевич'), [self.post.pk])
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(self.found('каренина'), [])
+
+    def test_search_view_highlights_and_escapes(self):
+        response = Client().get(reverse('posts:search'), {'q': 'семейн'})
+        self.assertEqual(list(response.context['page_obj']), [self.other])
+        self.assertContains(response, '&lt;b&gt;<mark>семейного</mark>')
+        self.assertNotContains(response, '<b>семейного</b>')
+
+    @override_settings(POSTS_COUNT=1)
+    def test_search_view_pagination_keeps_query(self):
+        response = Client().get(reverse('posts:search'), {'q': 'сем'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        self.assertContains(response, '?q=%D1%81%D0%B5%D0%BC&amp;page=2')
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'счастл'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post])
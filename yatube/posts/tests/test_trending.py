@@ -0,0 +1,97 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Group, GroupScore, Post, PostScore
+from ..trending import combine, contribution, update_scores
+
+User = get_user_model()
+
+
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Новости', slug='news', description='Свежее')
+        cls.quiet = Group.objects.create(
+            title='Архив', slug='archive', description='Старое')
+        now = timezone.now()
+        cls.old = Post.objects.create(
+            author=cls.author, text='Старый пост', group=cls.quiet)
+        cls.new = Post.objects.create(
+            author=cls.author, text='Новый пост', group=cls.group)
+        Post.objects.filter(pk=cls.old.pk).update(
+            pub_date=now - timedelta(days=2))
+        Post.objects.filter(pk=cls.new.pk).update(pub_date=now)
+
+    def setUp(self):
+        cache.clear()
+
+    def score(self, post):
+        return PostScore.objects.get(post=post).score
+
+    def comment(self, post, count):
+        for number in range(count):
+            Comment.objects.create(post=post, author=self.author, text='Да')
+
+    def trending(self, **params):
+        response = Client().get(reverse('posts:trending'), params)
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_scores_add_up_in_log_space(self):
+        moment = timezone.now()
+        self.assertAlmostEqual(
+            combine(contribution(1, moment), contribution(3, moment)),
+            contribution(4, moment))
+        later = moment + timedelta(hours=24)
+        with self.settings(TRENDING_HALF_LIFE_HOURS=24):
+            self.assertAlmostEqual(
+                contribution(1, later), contribution(2, moment))
+
+    def test_newer_post_ranks_higher_until_old_one_is_discussed(self):
+        self.assertEqual(update_scores(), 2)
+        self.assertGreater(self.score(self.new), self.score(self.old))
+        self.assertEqual(update_scores(), 0)
+        self.comment(self.old, 2)
+        self.assertEqual(update_scores(), 1)
+        self.assertGreater(self.score(self.old), self.score(self.new))
+        self.assertEqual(
+            PostScore.objects.get(post=self.old).comments_seen, 2)
+
+    def test_group_score_sums_its_posts(self):
+        update_scores()
+        other = Post.objects.create(
+            author=self.author, text='Ещё новость', group=self.group)
+        update_scores()
+        group = GroupScore.objects.get(group=self.group)
+        self.assertAlmostEqual(
+            group.score, combine(self.score(self.new), self.score(other)))
+
+    @override_settings(POSTS_COUNT=1, NUMBERED_PAGES_LIMIT=1)
+    def test_trending_page_is_ordered_by_score(self):
+        self.assertEqual(self.trending(), [])
+        call_command('update_scores', stdout=StringIO())
+        self.assertEqual(self.trending(), [self.new.pk])
+        response = Client().get(reverse('posts:trending'))
+        cursor = response.context['page_obj'].next_cursor
+        self.assertEqual(self.trending(cursor=cursor), [self.old.pk])
+        self.comment(self.old, 2)
+        call_command('update_scores', stdout=StringIO())
+        self.assertEqual(self.trending(), [self.old.pk])
+
+    def test_hot_groups_page(self):
+        call_command('update_scores', stdout=StringIO())
+        response = Client().get(reverse('posts:hot_groups'))
+        self.assertEqual(
+            [score.group for score in response.context['scores']],
+            [self.group, self.quiet])
+        self.assertContains(
+            response, reverse('posts:group_list', args=['news']))
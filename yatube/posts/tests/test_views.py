@@ -5,11 +5,16 @@ import tempfile
 from django.contrib.auth import get_user_model
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
+from django.utils.http import http_date
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 from django.core.cache import cache
 
-from ..models import Follow, Group, Post
+from ..feeds import group_version, index_version, profile_version
+from ..models import Follow, Group, Post, TimelineEntry
+from ..rows import PostRow, post_rows
+from ..templatetags.feed import post_cards
+from .utils import capture_on_commit_callbacks
 from django import forms
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -60,19 +65,15 @@ class PostsPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
     def test_cache(self):
-        posts_count = Post.objects.count()
         response = self.authorized_client.get(reverse('posts:index')).content
-        Post.objects.create(
-            text='Тестовый текст для проверки кэша',
-            author=self.user,
-            group=self.group
-        )
-        self.assertEqual(Post.objects.count(), posts_count + 1)
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Текст без сигналов', excerpt='Текст без сигналов')
         self.assertEqual(
             response,
             self.authorized_client.get(reverse('posts:index')).content
@@ -83,6 +84,43 @@ class PostsPagesTests(TestCase):
             self.authorized_client.get(reverse('posts:index')).content
         )
 
+    def test_cache_invalidated_by_writes(self):
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        for page in pages:
+            self.authorized_client.get(page)
+        with capture_on_commit_callbacks(execute=True):
+            Post.objects.create(
+                text='Тестовый текст для проверки кэша',
+                author=self.user,
+                group=self.group
+            )
+        for page in pages:
+            with self.subTest(page=page):
+                self.assertContains(
+                    self.authorized_client.get(page),
+                    'Тестовый текст для проверки кэша'
+                )
+
+    def test_cache_generations_move_only_after_commit(self):
+        def versions():
+            return [index_version(), group_version(self.group),
+                    profile_version(self.user)]
+
+        before = versions()
+        with capture_on_commit_callbacks() as callbacks:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                {'text': 'Новый пост', 'group': self.group.pk})
+            self.assertEqual(versions(), before)
+        for callback in callbacks:
+            callback()
+        for version, old in zip(versions(), before):
+            self.assertNotEqual(version, old)
+
     def test_follow_page_sub(self):
         follow = Follow.objects.filter(user=self.user, author=self.author_с)
         follow.delete()
@@ -126,20 +164,20 @@ class PostsPagesTests(TestCase):
         response = self.authorized_client.get(
             reverse('posts:index'))
         for post in response.context['page_obj']:
-            self.assertIsInstance(post, Post)
+            self.assertIsInstance(post, PostRow)
 
     def test_context_group_page(self):
         response = self.authorized_client.get(
             reverse('posts:group_list', kwargs={'slug': self.group.slug}))
         for post in response.context['page_obj']:
-            self.assertEqual(post.group, self.group)
+            self.assertEqual(post.group.pk, self.group.pk)
 
     def test_context_profile_page(self):
         response = self.authorized_client.get(
             reverse('posts:profile',
                     kwargs={'username': self.post.author.username}))
         for post in response.context['page_obj']:
-            self.assertEqual(post.author, self.user)
+            self.assertEqual(post.author.pk, self.user.pk)
 
     def test_context_post_detail_page(self):
         response = self.authorized_client.get(
@@ -177,7 +215,7 @@ class PostsPagesTests(TestCase):
         first_object = response.context['page_obj'][0]
         post_author_0 = first_object.author.username
         post_pud_date_0 = first_object.pub_date
-        post_text_0 = first_object.text
+        post_text_0 = first_object.excerpt
         post_slug_0 = first_object.group.slug
         post_image_0 = first_object.image
         self.assertEqual(post_author_0, self.post.author.username)
@@ -193,7 +231,7 @@ class PostsPagesTests(TestCase):
         first_object = response.context['page_obj'][0]
         post_author_0 = first_object.author.username
         post_pud_date_0 = first_object.pub_date
-        post_text_0 = first_object.text
+        post_text_0 = first_object.excerpt
         post_slug_0 = first_object.group.slug
         post_image_0 = first_object.image
         self.assertEqual(post_author_0, self.post.author.username)
@@ -210,7 +248,7 @@ class PostsPagesTests(TestCase):
         first_object = response.context['page_obj'][0]
         post_author_0 = first_object.author.username
         post_pud_date_0 = first_object.pub_date
-        post_text_0 = first_object.text
+        post_text_0 = first_object.excerpt
         post_slug_0 = first_object.group.slug
         post_image_0 = first_object.image
         self.assertEqual(post_author_0, self.post.author.username)
@@ -242,15 +280,105 @@ class PostsPagesTests(TestCase):
             text='Тестовый',
             group=self.author_group
         )
-        Follow.objects.create(author=self.author_с, user=self.user)
+        Follow.objects.get_or_create(author=self.author_с, user=self.user)
         response = self.authorized_client.get(reverse('posts:follow_index'))
         first_object = response.context['page_obj'][0]
         post_author_0 = first_object.author.username
         post_pud_date_0 = first_object.pub_date
-        post_text_0 = first_object.text
+        post_text_0 = first_object.excerpt
         post_slug_0 = first_object.group.slug
         self.assertEqual(post_author_0, author_post.author.username)
         self.assertEqual(post_pud_date_0, author_post.pub_date)
         self.assertEqual(post_text_0, author_post.text)
         self.assertEqual(post_slug_0, author_post.group.slug)
         self.assertIsNotNone(author_post)
+
+    def test_new_post_is_written_to_follower_timeline(self):
+        post = Post.objects.create(author=self.author_с, text='Новый пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(
+            post.pk, [row.pk for row in response.context['page_obj']])
+
+    def test_unfollow_cleans_only_own_timeline(self):
+        reader = User.objects.create_user(username='Reader')
+        Follow.objects.create(user=reader, author=self.author_с)
+        Post.objects.create(author=self.author_с, text='Пост для ленты')
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': self.author_с.username}))
+        self.assertFalse(self.user.timeline.exists())
+        self.assertTrue(reader.timeline.exists())
+        self.assertTrue(
+            Follow.objects.filter(user=reader, author=self.author_с).exists())
+
+    def test_feed_shows_excerpt_with_read_more(self):
+        long_text = 'Длинный текст. ' * 100
+        post = Post.objects.create(author=self.user, text=long_text)
+        self.assertTrue(post.is_truncated)
+        self.assertTrue(long_text.startswith(post.excerpt[:-1]))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, long_text)
+        self.assertContains(response, post.excerpt)
+        self.assertContains(response, 'Читать дальше', count=1)
+        post.text = 'Короткий'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'Короткий')
+        self.assertFalse(post.is_truncated)
+
+    def test_post_cards_are_cached_until_edit(self):
+        rows = post_rows(Post.objects.filter(pk=self.post.pk))
+        post_cards(rows)
+        Post.objects.filter(pk=self.post.pk).update(text='Текст без сигналов')
+        card, = post_cards(rows.all())
+        self.assertIn(self.post.text, card)
+        post = Post.objects.get(pk=self.post.pk)
+        post.save()
+        card, = post_cards(rows.all())
+        self.assertIn('Текст без сигналов', card)
+
+    def test_conditional_get(self):
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        )
+        etags = {}
+        for page in pages:
+            with self.subTest(page=page):
+                self.authorized_client.get(page)
+                etags[page] = self.authorized_client.get(page)['ETag']
+                response = self.authorized_client.get(
+                    page, HTTP_IF_NONE_MATCH=etags[page])
+                self.assertEqual(response.status_code, 304)
+        with capture_on_commit_callbacks(execute=True):
+            Post.objects.create(
+                author=self.user, text='Новый', group=self.group)
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(
+                    page, HTTP_IF_NONE_MATCH=etags[page])
+                self.assertEqual(response.status_code, 200)
+
+    def test_author_rename_refreshes_group_page(self):
+        page = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        etag = self.authorized_client.get(page)['ETag']
+        self.user.first_name = 'Переименованный'
+        with capture_on_commit_callbacks(execute=True):
+            self.user.save()
+        response = self.authorized_client.get(page, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Переименованный')
+
+    def test_post_detail_revalidates_only_by_etag(self):
+        page = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        response = self.guest_client.get(page)
+        self.assertFalse(response.has_header('Last-Modified'))
+        # Дата поста не меняется при входе зрителя — страница меняется.
+        response = self.authorized_client.get(
+            page, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,123 @@
+"""Рейтинги «Популярного» с затуханием по времени.
+
+Затухание прямое: событие веса ``w`` в момент ``t`` добавляет к рейтингу
+``w * 2 ** ((t - EPOCH) / HALF_LIFE)``. Старые вклады не пересчитываются —
+вместо того чтобы уменьшать их, каждое новое событие весит вдвое больше,
+чем такое же полупериодом раньше. Порядок получается тот же, а рейтинг
+обновляется только у постов, где что-то произошло. Числа растут
+экспоненциально, поэтому хранится двоичный логарифм суммы.
+"""
+import math
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import GroupScore, Post, PostScore
+
+EPOCH = datetime(2021, 1, 1, tzinfo=timezone.utc)
+PUBLISH_WEIGHT = 1
+COMMENT_WEIGHT = 3
+VIEW_WEIGHT = 0.1
+# Охват — log2(1 + подписчики автора): тысяча подписчиков не делает пост
+# в тысячу раз популярнее.
+REACH_WEIGHT = 1
+
+
+def half_life():
+    return timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS)
+
+
+def contribution(weight, moment):
+    """log2 вклада события веса ``weight`` в момент ``moment``."""
+    return math.log2(weight) + (moment - EPOCH) / half_life()
+
+
+def combine(score, extra):
+    """log2(2 ** score + 2 ** extra) без переполнения."""
+    if score is None:
+        return extra
+    high, low = max(score, extra), min(score, extra)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def stale_posts():
+    """Посты без рейтинга, с новыми комментариями или просмотрами."""
+    return Post.objects.filter(
+        Q(score__isnull=True)
+        | ~Q(comments_count=F('score__comments_seen'))
+        | ~Q(views_count=F('score__views_seen'))
+    )
+
+
+def post_events(post, now):
+    """log2 вкладов, которые пост набрал с прошлого пересчёта."""
+    events = []
+    if post.score_value is None:
+        reach = math.log2(1 + (post.followers_count or 0))
+        events.append(contribution(
+            PUBLISH_WEIGHT + REACH_WEIGHT * reach, post.pub_date))
+    new_comments = max(post.comments_count - (post.comments_seen or 0), 0)
+    new_views = max(post.views_count - (post.views_seen or 0), 0)
+    weight = COMMENT_WEIGHT * new_comments + VIEW_WEIGHT * new_views
+    if weight:
+        events.append(contribution(weight, now))
+    return events
+
+
+def update_scores(batch_size=500, now=None):
+    """Дописать рейтинги постов и групп; вернуть число обновлённых постов.
+
+    Новые комментарии и просмотры считаются случившимися в момент пересчёта —
+    при периодическом запуске ошибка не больше интервала между запусками.
+    """
+    now = now or timezone.now()
+    updated = 0
+    while True:
+        posts = list(
+            stale_posts().order_by('pk').annotate(
+                score_value=F('score__score'),
+                comments_seen=F('score__comments_seen'),
+                views_seen=F('score__views_seen'),
+                followers_count=F('author__stats__followers_count'),
+            ).only('pk', 'group_id', 'pub_date', 'comments_count',
+                   'views_count')
+            [:batch_size])
+        if not posts:
+            return updated
+        apply_events(posts, now)
+        updated += len(posts)
+
+
+@transaction.atomic
+def apply_events(posts, now):
+    groups = GroupScore.objects.select_for_update().in_bulk(
+        {post.group_id for post in posts if post.group_id})
+    new_scores, changed_scores = [], []
+    for post in posts:
+        events = post_events(post, now)
+        score = PostScore(
+            post_id=post.pk, score=post.score_value,
+            comments_seen=post.comments_count, views_seen=post.views_count)
+        for extra in events:
+            score.score = combine(score.score, extra)
+            if post.group_id:
+                group = groups.setdefault(
+                    post.group_id,
+                    GroupScore(group_id=post.group_id, score=None))
+                group.score = combine(group.score, extra)
+        if post.score_value is None:
+            new_scores.append(score)
+        else:
+            changed_scores.append(score)
+    new_groups = [
+        group for group in groups.values() if group._state.adding]
+    changed_groups = [
+        group for group in groups.values() if not group._state.adding]
+    PostScore.objects.bulk_create(new_scores)
+    PostScore.objects.bulk_update(
+        changed_scores, ['score', 'comments_seen', 'views_seen'])
+    GroupScore.objects.bulk_create(new_groups)
+    GroupScore.objects.bulk_update(changed_groups, ['score'])
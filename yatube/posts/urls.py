@@ -6,6 +6,11 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('trending/', views.trending, name='trending'),
+    path('groups/hot/', views.hot_groups, name='hot_groups'),
+    path('search/', views.search, name='search'),
+    path('autocomplete/<str:kind>/',
+         views.autocomplete_lookup, name='autocomplete'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
@@ -13,7 +18,13 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='comments'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('profile/<str:username>/followers/',
+         views.followers_list, name='followers'),
+    path('profile/<str:username>/following/',
+         views.following_list, name='following'),
     path('profile/<str:username>/follow/',
          views.profile_follow, name='profile_follow'),
     path('profile/<str:username>/unfollow/',
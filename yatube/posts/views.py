@@ -1,66 +1,141 @@
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.http import Http404, JsonResponse
+from django.utils.http import urlencode
+from django.db import transaction
+from django.views.decorators.http import condition
 
+from core.queries import query_budget
+
+from . import autocomplete, conditions, graph
+from .counters import count_view
+from .feeds import (cached_group, count_key, follow_version, group_version,
+                    index_version, profile_version, trending_version)
 from .forms import CommentForm, PostForm
-from yatube.settings import POSTS_COUNT
-from .models import Follow, Group, Post
+from .models import (AuthorStats, Comment, Follow, GroupScore, Post,
+                     PostScore)
+from .paginators import WindowedPaginator, paginate, paginate_comments
+from .rows import post_rows, post_rows_by_ids
+from .search import SearchResults
 
 
+@query_budget(7)
+@condition(etag_func=conditions.index_etag)
 def index(request):
-    posts = Post.objects.all()
-    paginator = Paginator(posts, POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    version = index_version()
+    page_obj = paginate(request, Post.objects.all(), rows=post_rows,
+                        count_key=count_key('index', 'counts'))
     context = {
         'page_obj': page_obj,
+        'version': version,
     }
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(7)
+@condition(etag_func=conditions.trending_etag)
+def trending(request):
+    version = trending_version()
+    scores = PostScore.objects.only('post_id', 'score')
+    page_obj = paginate(request, scores, ordering=('-score', '-post_id'),
+                        count_key=count_key('trending', 'trending', 'counts'))
+    page_obj.object_list = post_rows_by_ids(
+        [score.post_id for score in page_obj])
+    context = {
+        'page_obj': page_obj,
+        'version': version,
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@query_budget(3)
+@condition(etag_func=conditions.trending_etag)
+def hot_groups(request):
+    context = {
+        'scores': GroupScore.objects.select_related('group').order_by(
+            '-score')[:settings.HOT_GROUPS_COUNT],
+    }
+    return render(request, 'posts/hot_groups.html', context)
+
+
+@query_budget(5)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = WindowedPaginator(SearchResults(query), settings.POSTS_COUNT)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_prefix': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(1)
+def autocomplete_lookup(request, kind):
+    index = autocomplete.INDEXES.get(kind)
+    if index is None:
+        raise Http404
+    results = index.search(
+        request.GET.get('q', ''), settings.AUTOCOMPLETE_LIMIT)
+    return JsonResponse({'results': results})
+
+
+@query_budget(7)
+@condition(etag_func=conditions.group_etag)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()[:12]
-    paginator = Paginator(posts, POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = cached_group(slug)
+    if group is None:
+        raise Http404
+    version = group_version(group)
+    page_obj = paginate(request, group.posts.all(), rows=post_rows,
+                        count_key=count_key(
+                            f'group:{group.pk}', f'counts:group:{group.pk}'))
     context = {
         'group': group,
-        'posts': posts,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'version': version,
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(10)
+@condition(etag_func=conditions.profile_etag)
 def profile(request, username):
-    user_author = get_object_or_404(User, username=username)
-    posts = user_author.posts.all()
-    following = user_author.following.all()
-    follow = False
-    authors = []
-    for aut in following:
-        author = aut.user
-        authors.append(author)
-    if request.user in authors:
-        follow = True
-    paginator = Paginator(posts, POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    count = posts.count()
+    user_author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    follow = graph.is_following(request.user, user_author)
+    suggestions = (
+        graph.suggestions(request.user)
+        if request.user == user_author else [])
+    version = profile_version(user_author)
+    page_obj = paginate(request, user_author.posts.all(), rows=post_rows,
+                        count_key=count_key(
+                            f'profile:{user_author.pk}',
+                            f'counts:author:{user_author.pk}'))
+    count = AuthorStats.objects.for_user(user_author).posts_count
     context = {
         'user_author': user_author,
         'count': count,
         'page_obj': page_obj,
-        'paginator': paginator,
-        'follow': follow
+        'paginator': page_obj.paginator,
+        'follow': follow,
+        'suggestions': suggestions,
+        'version': version,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@count_view
+@query_budget(6)
+@condition(etag_func=conditions.post_detail_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
+    AuthorStats.objects.for_user(post.author)
+    comments = paginate_comments(post)
     form = CommentForm(data=request.POST)
     context = {
         'form': form,
@@ -71,6 +146,7 @@ def post_detail(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -96,7 +172,7 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        post.save()
+        form.save()
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -107,14 +183,18 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
+    AuthorStats.objects.for_user(post.author)
+    comments = paginate_comments(post)
     form = CommentForm(data=request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        comment.parent = find_parent(post, request.POST.get('parent'))
         comment.save()
         return redirect('posts:post_detail', post_id=post_id)
     context = {
@@ -125,22 +205,83 @@ def add_comment(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def find_parent(post, parent_id):
+    if not parent_id or not parent_id.isdigit():
+        return None
+    return post.comments.filter(pk=parent_id).first()
+
+
+@query_budget(5)
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    thread = request.GET.get('thread')
+    if thread:
+        if not thread.isdigit():
+            raise Http404
+        root = get_object_or_404(post.comments, pk=thread)
+        comments = Comment.objects.subtree(root).select_related('author')
+    else:
+        comments = paginate_comments(post, request.GET.get('cursor'))
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+@query_budget(9)
 @login_required
+@condition(etag_func=conditions.follow_etag)
 def follow_index(request):
     user = get_object_or_404(User, username=request.user)
-    followings = user.follower.all()
-    posts = Post.objects.filter(author__following__user=user)
-    paginator = Paginator(posts, POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    entries = user.timeline.only('pk', 'user_id', 'post_id', 'pub_date')
+    version = follow_version(user)
+    key = count_key(f'follow:{user.pk}', 'counts', f'follow:{user.pk}')
+    page_obj = paginate(request, entries, count_key=key)
+    page_obj.object_list = post_rows_by_ids(
+        [entry.post_id for entry in page_obj])
     context = {
         'page_obj': page_obj,
-        'followings': followings
+        'suggestions': graph.suggestions(user),
+        'version': version,
     }
     return render(request, 'posts/follow.html', context)
 
 
+def people_page(request, user_author, follows, person, title, counted_by):
+    page_obj = paginate(
+        request, follows, ordering=('-pk',),
+        count_key=count_key(f'people:{person}:{user_author.pk}', counted_by))
+    page_obj.object_list = [
+        getattr(follow, person) for follow in page_obj]
+    context = {
+        'user_author': user_author,
+        'title': title,
+        'page_obj': page_obj,
+        'followed': graph.followed_ids(
+            request.user, [user.pk for user in page_obj]),
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+@query_budget(6)
+def followers_list(request, username):
+    user_author = get_object_or_404(User, username=username)
+    return people_page(
+        request, user_author, graph.followers(user_author), 'user',
+        'Подписчики', f'followers:{user_author.pk}')
+
+
+@query_budget(6)
+def following_list(request, username):
+    user_author = get_object_or_404(User, username=username)
+    return people_page(
+        request, user_author, graph.following(user_author), 'author',
+        'Подписки', f'follow:{user_author.pk}')
+
+
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     user = get_object_or_404(User, username=request.user)
     author = get_object_or_404(User, username=username)
@@ -151,8 +292,9 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    follow = Follow.objects.filter(author__username=author.username)
+    follow = Follow.objects.filter(user=request.user, author=author)
     follow.delete()
     return redirect('posts:profile', username)
@@ -0,0 +1,35 @@
+from django import forms
+from django.urls import reverse
+
+
+class LazySelect(forms.Select):
+    """<select>, в который попадает только выбранный вариант.
+
+    Остальные варианты подгружает autocomplete.js из JSON-поиска по мере
+    ввода, так что страница не перечисляет всю таблицу.
+    """
+
+    class Media:
+        js = ('js/autocomplete.js',)
+
+    def __init__(self, kind, attrs=None):
+        super().__init__(attrs)
+        self.kind = kind
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-autocomplete'] = reverse(
+            'posts:autocomplete', args=[self.kind])
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        field = self.choices.field
+        selected = field.queryset.filter(pk__in=[pk for pk in value if pk])
+        choices = [('', field.empty_label)] + [
+            (obj.pk, field.label_from_instance(obj)) for obj in selected]
+        return [
+            (None, [self.create_option(
+                name, option_value, label, str(option_value) in value,
+                index)], index)
+            for index, (option_value, label) in enumerate(choices)
+        ]
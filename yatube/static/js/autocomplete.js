@@ -0,0 +1,32 @@
+// Поле поиска перед <select data-autocomplete>: варианты приходят
+// из JSON-эндпоинта, выбранный вариант сохраняется.
+document.addEventListener('DOMContentLoaded', function () {
+  document.querySelectorAll('select[data-autocomplete]').forEach(function (select) {
+    var input = document.createElement('input');
+    var timer = null;
+    input.type = 'search';
+    input.className = 'form-control mb-1';
+    input.placeholder = 'Начните вводить название';
+    select.parentNode.insertBefore(input, select);
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var url = select.dataset.autocomplete + '?q=' + encodeURIComponent(input.value);
+        fetch(url).then(function (response) {
+          return response.json();
+        }).then(function (data) {
+          Array.from(select.options).forEach(function (option) {
+            if (option.value && !option.selected) {
+              option.remove();
+            }
+          });
+          data.results.forEach(function (item) {
+            if (!select.querySelector('option[value="' + item.id + '"]')) {
+              select.add(new Option(item.title, item.id));
+            }
+          });
+        });
+      }, 150);
+    });
+  });
+});
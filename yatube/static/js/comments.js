@@ -0,0 +1,22 @@
+// «Показать ещё»: следующая страница комментариев встаёт на место ссылки.
+// «Ответить»: id комментария уходит в скрытое поле формы.
+document.addEventListener('click', function (event) {
+  var reply = event.target.closest('[data-comment-reply]');
+  if (reply) {
+    var form = document.getElementById('comment-form');
+    form.querySelector('[data-comment-parent]').value =
+      reply.dataset.commentReply;
+    form.querySelector('textarea').focus();
+    return;
+  }
+  var link = event.target.closest('[data-comments-more]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.href).then(function (response) {
+    return response.text();
+  }).then(function (html) {
+    link.outerHTML = html;
+  });
+});
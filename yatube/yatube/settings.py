@@ -140,8 +140,43 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 POSTS_COUNT = 10
+COMMENTS_COUNT = 20
+COMMENT_MAX_DEPTH = 4
+NUMBERED_PAGES_LIMIT = 5
+PAGINATOR_WINDOW = 2
+AUTOCOMPLETE_LIMIT = 10
+SUGGESTIONS_COUNT = 5
+HOT_GROUPS_COUNT = 10
+# За сколько часов вклад события в рейтинг «Популярного»
+# уменьшается вдвое.
+TRENDING_HALF_LIFE_HOURS = 24
+# Как часто накопленные просмотры постов пишутся в базу, в секундах;
+# 0 — сразу при каждом просмотре.
+VIEW_COUNTS_FLUSH_INTERVAL = 10
+# Писать просмотры фоновым потоком; в тестах выключено (core.testing).
+VIEW_COUNTS_FLUSH_THREAD = True
+# Превышение бюджета запросов: True — исключение, False — запись в лог.
+# В тестах включено (core.testing).
+QUERY_BUDGET_RAISE = False
+QUERY_BUDGET_MAX_REPEATS = 3
+# manage.py test и pytest (conftest.py) включают core.testing.TEST_SETTINGS.
+TEST_RUNNER = 'core.testing.TestRunner'
 MEDIA_URL = '/media/'
+# Миниатюры строятся при загрузке; геометрия и опции должны совпадать
+# с тегами {% thumbnail %} в шаблонах, иначе ключи sorl разойдутся.
+POST_THUMBNAILS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Загрузки больше 256 КБ пишутся во временный файл, а не в память.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+# Картинки с большим числом пикселей отклоняются по заголовку,
+# остальные уменьшаются до POST_IMAGE_MAX_SIZE и пережимаются.
+POST_IMAGE_MAX_PIXELS = 40_000_000
+# Уменьшенным декодируется только JPEG; PNG, WebP, GIF и прочие
+# раскрываются в память целиком, поэтому для них предел ниже.
+POST_IMAGE_MAX_PIXELS_FULL_DECODE = 8_000_000
+POST_IMAGE_MAX_SIZE = (2560, 2560)
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 CACHES = {
     'default': {